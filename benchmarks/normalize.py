@@ -0,0 +1,134 @@
+#!/usr/bin/python3
+# coding: utf-8
+
+"""
+This module is to benchmark cue normalization: the previous per-cue re.sub /
+str.replace chains vs utils.subtitle.normalize_subtitle.
+
+python benchmarks/normalize.py [--cues N] [--runs N]
+"""
+import argparse
+import random
+import re
+import sys
+import time
+from pathlib import Path
+
+import pysubs2
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from utils.subtitle import normalize_subtitle  # noqa: E402
+
+
+def format_zh_subtitle_before(subs):
+    for sub in subs:
+        text = sub.text
+        if re.search(r'[\u4E00-\u9FFF]', text):
+            text = text.replace('(', '（')
+            text = text.replace(')', '）')
+            text = text.replace('!', '！')
+            text = text.replace('?', '？')
+            text = text.replace(':', '：')
+            text = text.replace('...', '…')
+            text = text.replace(' （', '（')
+            text = text.replace('） ', '）')
+            text = text.replace('） ', '）')
+            text = text.replace('） ', '）')
+            if text.count('-') == 2:
+                text = text.replace('- ', '-')
+            text = re.sub(r',([\u4E00-\u9FFF]+)', '，\\1', text)
+            text = re.sub(r'([\u4E00-\u9FFF]+),', '\\1，', text)
+            text = re.sub(r'\u3000\u3000', ' -', text)
+            conversation = re.search(r'( )-[ \u4E00-\u9FFF「0-9]+', text)
+            if conversation:
+                text = text.replace(' -', '\n-')
+            text = re.sub(r'(^[「\u4E00-\u9FFF]+.*?)\n-', '-\\1\n-', text)
+        text = text.replace('  ', ' ')
+        text = text.replace('\xa0 ', ' ')
+        sub.text = text.strip()
+    return subs
+
+
+def clean_subs_before(subs):
+    for sub in subs:
+        text = sub.text
+        text = re.sub(r"&rlm;", "", text)
+        text = re.sub(r"&lrm;", "", text)
+        text = re.sub(r"&amp;", "&", text)
+        sub.text = text.strip()
+    return subs
+
+
+def format_subtitle_before(subs):
+    delete_list = []
+    for i, sub in enumerate(subs):
+        sub.text = re.sub(r'\u200b', '', sub.text)
+        sub.text = re.sub(r'\u200e', '', sub.text)
+        sub.text = re.sub(r'\u202a', '', sub.text)
+        sub.text = re.sub(r'\ufeff', '', sub.text)
+        sub.text = re.sub(r'\xa0', ' ', sub.text)
+        if sub.text == "":
+            delete_list.append(i)
+    for i in reversed(delete_list):
+        del subs[i]
+    return subs
+
+
+def before(subs):
+    return format_subtitle_before(format_zh_subtitle_before(clean_subs_before(subs)))
+
+
+def after(subs):
+    return normalize_subtitle(subs, zh=True)
+
+
+def make_texts(cues):
+    """Synthetic zh-Hant track"""
+
+    random.seed(0)
+    lines = ['我們走吧!', '(笑聲) 真的嗎?', '他說:「等等...」', '- 你好\u3000\u3000- 再見',
+             '好,我知道了', '&lrm;這是\u200b測試&amp;', 'Hello\xa0world', '\ufeff']
+    return [random.choice(lines) for _ in range(cues)]
+
+
+def make_subtitle(texts):
+    subs = pysubs2.SSAFile()
+    for index, text in enumerate(texts):
+        subs.append(pysubs2.SSAEvent(start=index * 2000,
+                    end=index * 2000 + 1500, text=text))
+    return subs
+
+
+def measure(func, texts, runs):
+    """Best wall time of func over fresh copies of the track"""
+
+    timings = []
+    for _ in range(runs):
+        subs = make_subtitle(texts)
+        start = time.perf_counter()
+        func(subs)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--cues', type=int, default=20000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    texts = make_texts(args.cues)
+    assert [e.text for e in before(make_subtitle(texts))] == [
+        e.text for e in after(make_subtitle(texts))]
+
+    before_time = measure(before, texts, args.runs)
+    after_time = measure(after, texts, args.runs)
+    print(f'{args.cues} cues')
+    print(f'before: {before_time * 1000:8.1f} ms')
+    print(f'after:  {after_time * 1000:8.1f} ms')
+    print(f'speed-up: {before_time / after_time:6.2f}x')
+
+
+if __name__ == "__main__":
+    main()
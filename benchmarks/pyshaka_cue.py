@@ -0,0 +1,89 @@
+#!/usr/bin/python3
+# coding: utf-8
+
+"""
+This module is to benchmark pyshaka cue creation: parse a synthetic styled
+TTML document with TtmlTextParser and report cues/sec and peak memory.
+With --segments the lines are split into fragments that repeat the same
+<head>, parsed by one TtmlTextParser like Mp4TtmlParser does.
+
+python benchmarks/pyshaka_cue.py [--lines N] [--runs N] [--segments N] [--no-cache]
+"""
+import argparse
+import resource
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from tools.pyshaka.text.TtmlTextParser import TtmlTextParser  # noqa: E402
+from tools.pyshaka.util.TextParser import TimeContext  # noqa: E402
+
+
+def make_ttml(lines):
+    """Synthetic TTML movie, every line has styled spans and a line break"""
+
+    paragraphs = []
+    for index in range(lines):
+        begin = index * 2
+        paragraphs.append(
+            f'<p begin="{begin}.000s" end="{begin + 1}.500s" region="bottom" style="s1">'
+            f'<span style="s2">第 {index} 行</span><br/>'
+            f'<span tts:fontStyle="italic">line {index}</span> '
+            f'<span tts:textDecoration="underline">end</span></p>')
+    return (
+        '<?xml version="1.0" encoding="utf-8"?>'
+        '<tt xmlns="http://www.w3.org/ns/ttml" '
+        'xmlns:tts="http://www.w3.org/ns/ttml#styling" xml:lang="zh-Hant">'
+        '<head><styling>'
+        '<style xml:id="s1" tts:color="white" tts:fontSize="100%"/>'
+        '<style xml:id="s2" tts:color="yellow" tts:fontFamily="sansSerif"/>'
+        '</styling><layout>'
+        '<region xml:id="bottom" tts:origin="10% 80%" tts:extent="80% 20%" tts:displayAlign="after"/>'
+        '</layout></head>'
+        f'<body><div>{"".join(paragraphs)}</div></body></tt>').encode('utf-8')
+
+
+def count_cues(cues):
+    return sum(1 + count_cues(cue.nestedCues) for cue in cues)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--lines', type=int, default=5000)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--segments', type=int, default=1)
+    parser.add_argument('--no-cache', action='store_true',
+                        help='parse fragments without the cross-segment head cache')
+    args = parser.parse_args()
+
+    segments = [make_ttml(max(args.lines // args.segments, 1))] * args.segments
+    context = TimeContext(periodStart=0, segmentStart=0, segmentEnd=0)
+
+    def parse():
+        text_parser = TtmlTextParser(cacheHead=not args.no_cache)
+        return [cue for data in segments for cue in text_parser.parseMedia(data, context)]
+
+    timings = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        cues = parse()
+        timings.append(time.perf_counter() - start)
+    total = count_cues(cues)
+    del cues
+
+    tracemalloc.start()
+    cues = parse()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    print(f'{args.lines} lines in {args.segments} segment(s), {total} cues (incl. nested)')
+    print(f'cues/sec:     {total / min(timings):12.0f}')
+    print(f'traced peak:  {peak / 1024 / 1024:9.1f} MiB')
+    print(f'peak RSS:     {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:9.1f} MiB')
+
+
+if __name__ == "__main__":
+    main()
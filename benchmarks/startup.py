@@ -0,0 +1,59 @@
+#!/usr/bin/python3
+# coding: utf-8
+
+"""
+This module is to benchmark cold start: eager import of every service vs
+lazy import of the matched service only.
+
+python benchmarks/startup.py [url] [--runs N]
+"""
+import argparse
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+EAGER = '''
+from importlib import import_module
+from services import service_map
+for service in service_map:
+    import_module(service['module'])
+'''
+
+LAZY = '''
+from services import service_map, get_service_class
+service = next(service for service in service_map if service['domain'] in {url!r})
+get_service_class(service)
+'''
+
+
+def measure(code, runs):
+    """Median wall time of a fresh interpreter running code"""
+
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('url', nargs='?',
+                        default='https://www.kktv.me/titles/00000000')
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    eager = measure(EAGER, args.runs)
+    lazy = measure(LAZY.format(url=args.url), args.runs)
+    print(f'eager import (all services): {eager * 1000:8.1f} ms')
+    print(f'lazy import (matched only):  {lazy * 1000:8.1f} ms')
+    print(f'speed-up:                    {eager / lazy:8.2f}x')
+
+
+if __name__ == "__main__":
+    main()
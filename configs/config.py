@@ -25,6 +25,9 @@ class Config:
         self.headers: dict = kwargs.get("headers") or {}
         self.nordvpn: dict = kwargs.get("nordvpn") or {}
         self.proxies: dict = kwargs.get("proxies") or {}
+        self.download: dict = kwargs.get("download") or {}
+        self.cache: dict = kwargs.get("cache") or {}
+        self.archive: dict = kwargs.get("archive") or {}
 
     @classmethod
     def from_toml(cls, path: Path) -> Config:
@@ -48,6 +51,7 @@ class Directories:
         self.downloads = self.package_root / 'downloads'
         self.cookies = self.package_root / 'cookies'
         self.logs = self.package_root / 'logs'
+        self.cache = self.package_root / 'cache'
 
 
 class Filenames:
@@ -70,5 +74,7 @@ if not config.directories.get('cookies'):
 if not config.directories.get('downloads'):
     config.directories['downloads'] = directories.downloads
 config.directories['logs'] = directories.logs
+if not config.directories.get('cache'):
+    config.directories['cache'] = directories.cache
 credentials = config.credentials
 user_agent = config.headers['User-Agent']
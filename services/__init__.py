@@ -5,109 +5,182 @@
 This module is for service initiation mapping
 """
 
+from __future__ import annotations
+from functools import lru_cache
+from importlib import import_module
+from typing import Optional
+from urllib.parse import urlsplit
 from constants import Service
-from services.kktv import KKTV
-from services.linetv import LineTV
-from services.fridayvideo import FridayVideo
-from services.catchplay import CatchPlay
-from services.iqiyi.iqiyi import IQIYI
-from services.mewatch import MeWatch
-from services.myvideo import MyVideo
-from services.nowplayer import NowPlayer
-from services.wetv.wetv import WeTV
-from services.viki import Viki
-from services.viu import Viu
-from services.nowe import NowE
-from services.disneyplus.disneyplus import DisneyPlus
-from services.hbogoasia import HBOGOAsia
-from services.itunes import iTunes
-from services.appletvplus import AppleTVPlus
-from services.youtube import YouTube
 
 service_map = [
     {
         'name': Service.APPLETVPLUS,
-        'class': AppleTVPlus,
+        'module': 'services.appletvplus',
+        'class': 'AppleTVPlus',
         'domain': 'tv.apple.com',
     },
     {
         'name': Service.CATCHPLAY,
-        'class': CatchPlay,
+        'module': 'services.catchplay',
+        'class': 'CatchPlay',
         'domain': 'catchplay.com'
     },
     {
         'name': Service.DISNEYPLUS,
-        'class': DisneyPlus,
+        'module': 'services.disneyplus.disneyplus',
+        'class': 'DisneyPlus',
         'domain': 'disneyplus.com'
     },
     {
         'name': Service.FRIDAYVIDEO,
-        'class': FridayVideo,
+        'module': 'services.fridayvideo',
+        'class': 'FridayVideo',
         'domain': 'video.friday.tw'
     },
     {
         'name': Service.HBOGOASIA,
-        'class': HBOGOAsia,
+        'module': 'services.hbogoasia',
+        'class': 'HBOGOAsia',
         'domain': 'hbogoasia'
     },
     {
         'name': Service.IQIYI,
-        'class': IQIYI,
+        'module': 'services.iqiyi.iqiyi',
+        'class': 'IQIYI',
         'domain': 'iq.com'
     },
     {
         'name': Service.ITUNES,
-        'class': iTunes,
+        'module': 'services.itunes',
+        'class': 'iTunes',
         'domain': 'itunes.apple.com',
     },
     {
         'name': Service.KKTV,
-        'class': KKTV,
+        'module': 'services.kktv',
+        'class': 'KKTV',
         'domain': 'kktv.me'
     },
     {
         'name': Service.LINETV,
-        'class': LineTV,
+        'module': 'services.linetv',
+        'class': 'LineTV',
         'domain': 'linetv.tw'
     },
     {
         'name': Service.MEWATCH,
-        'class': MeWatch,
+        'module': 'services.mewatch',
+        'class': 'MeWatch',
         'domain': 'mewatch.sg'
     },
     {
         'name': Service.MYVIDEO,
-        'class': MyVideo,
+        'module': 'services.myvideo',
+        'class': 'MyVideo',
         'domain': 'myvideo.net.tw'
     },
     {
         'name': Service.NOWE,
-        'class': NowE,
+        'module': 'services.nowe',
+        'class': 'NowE',
         'domain': 'nowe.com'
     },
     {
         'name': Service.NOWPLAYER,
-        'class': NowPlayer,
+        'module': 'services.nowplayer',
+        'class': 'NowPlayer',
         'domain': 'nowplayer.now.com'
     },
     {
         'name': Service.VIKI,
-        'class': Viki,
+        'module': 'services.viki',
+        'class': 'Viki',
         'domain': 'viki.com'
     },
     {
         'name': Service.VIU,
-        'class': Viu,
+        'module': 'services.viu',
+        'class': 'Viu',
         'domain': 'viu.com'
     },
     {
         'name': Service.WETV,
-        'class': WeTV,
+        'module': 'services.wetv.wetv',
+        'class': 'WeTV',
         'domain': 'wetv.vip'
     },
     {
         'name': Service.YOUTUBE,
-        'class': YouTube,
+        'module': 'services.youtube',
+        'class': 'YouTube',
         'domain': 'youtube.com'
     }
 ]
+
+
+@lru_cache(maxsize=None)
+def load_service(module, name):
+    """Import service class on demand"""
+
+    return getattr(import_module(module), name)
+
+
+def get_service_class(service):
+    """Get service class of a service_map entry"""
+
+    return load_service(service['module'], service['class'])
+
+
+class DomainRouter(object):
+    """
+    Resolve url to service by host labels: dotted domains are matched as host
+    suffixes on a reversed-label trie (longest match wins, e.g. tv.apple.com vs
+    itunes.apple.com), bare domains (e.g. hbogoasia) match any host label
+    """
+
+    def __init__(self, services):
+        self.trie = {}
+        self.labels = {}
+        for service in services:
+            domain = service['domain'].lower().strip('.')
+            if '.' not in domain:
+                self.labels[domain] = service
+                continue
+            node = self.trie
+            for label in reversed(domain.split('.')):
+                node = node.setdefault(label, {})
+            node[None] = service
+
+    def resolve(self, url: str) -> Optional[dict]:
+        """Get service of url, None if unsupported"""
+
+        if '://' not in url:
+            url = f'https://{url}'
+        try:
+            host = urlsplit(url.strip()).hostname
+        except ValueError:
+            return None
+        if not host:
+            return None
+
+        labels = host.split('.')
+        service = None
+        node = self.trie
+        for label in reversed(labels):
+            node = node.get(label)
+            if node is None:
+                break
+            service = node.get(None, service)
+        if service:
+            return service
+
+        return next((self.labels[label] for label in labels if label in self.labels), None)
+
+
+router = DomainRouter(service_map)
+
+
+def resolve(url: str) -> Optional[dict]:
+    """Get service_map entry of url"""
+
+    return router.resolve(url)
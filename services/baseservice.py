@@ -9,19 +9,20 @@ import html
 import os
 import ssl
 import sys
+from functools import cached_property
 from http.cookiejar import MozillaCookieJar
 from typing import Optional
 from pathlib import Path
 import requests
-from opencc import OpenCC
 from pwinput import pwinput
 
 from configs.config import config, credentials, filenames, user_agent
 from constants import SUBTITLE_FORMAT
-from utils.ripprocess import RipProcess
 from utils.proxy import get_ip_info, get_proxy
 from utils.helper import EpisodesNumbersHandler
 from utils.io import get_tmdb_info
+from utils.cache import CacheAdapter, ResponseCache
+from utils.manifest import Manifest
 
 
 class BaseService(object):
@@ -40,18 +41,16 @@ class BaseService(object):
         self.locale = args.locale
 
         self.cookies = {}
-        self.session = requests.Session()
-        self.session.mount('https://', TLSAdapter())
-        self.session.headers = {
-            'user-agent': user_agent
-        }
         self.config = self.validate_config(args.config)
+        # batch mode shares one session (connection pool, cache) per service and proxy
+        self.session = getattr(args, 'session', None) or create_session(
+            self.platform, self.config.get('cache') if self.config else None)
         self.movie = False
 
         if args.output and os.path.exists(args.output):
-            config.directories['downloads'] = args.output.strip()
-
-        self.download_path = config.directories['downloads']
+            self.download_path = args.output.strip()
+        else:
+            self.download_path = config.directories['downloads']
 
         if args.season:
             self.download_season = EpisodesNumbersHandler(
@@ -66,6 +65,7 @@ class BaseService(object):
             self.download_episode = []
 
         self.last_episode = args.last_episode
+        self.sync = args.sync
 
         self.session.cookies.update(self.cookies)
         self.cookies = self.session.cookies.get_dict()
@@ -74,11 +74,16 @@ class BaseService(object):
         if proxy:
             self.set_proxy(proxy)
 
-        self.ripprocess = RipProcess()
-
         self.subtitle_language = self.get_language_list(args.subtitle_language)
         self.subtitle_format = self.get_subtitle_format(args.subtitle_format)
 
+    @cached_property
+    def ripprocess(self):
+        """ RipProcess: imported on first use to keep XstreamDL/pyshaka out of startup """
+
+        from utils.ripprocess import RipProcess
+        return RipProcess()
+
     def validate_config(self, service_config):
         """ Validate service config """
 
@@ -123,6 +128,13 @@ class BaseService(object):
                 f"\nPlease put {os.path.basename(cookie_file)} in {Path(config.directories['cookies'])}")
             sys.exit(1)
 
+    def get_manifest(self, folder_path) -> Optional[Manifest]:
+        """ Get title's download manifest in sync mode """
+
+        if self.sync:
+            return Manifest(folder_path=folder_path, subtitle_format=self.subtitle_format)
+        return None
+
     def set_proxy(self, proxy):
         """Set proxy: support dynamic proxy in each service"""
 
@@ -163,6 +175,7 @@ class BaseService(object):
         if not title_aliases:
             title_aliases = []
 
+        from opencc import OpenCC
         title_aliases.append(OpenCC('t2s.json').convert(title))
 
         results = get_tmdb_info(
@@ -200,3 +213,30 @@ class TLSAdapter(requests.adapters.HTTPAdapter):
         ctx.set_ciphers('DEFAULT@SECLEVEL=1')
         kwargs['ssl_context'] = ctx
         return super(TLSAdapter, self).init_poolmanager(*args, **kwargs)
+
+
+class TLSCacheAdapter(CacheAdapter, TLSAdapter):
+    """
+    TLSAdapter with persistent response cache
+    """
+
+
+def create_session(platform, cache_config=None) -> requests.Session:
+    """
+    Create service session, with persistent response cache from service config:
+    ttl (seconds), include (url patterns)
+    """
+
+    session = requests.Session()
+    session.headers = {
+        'user-agent': user_agent
+    }
+    if cache_config:
+        cache = ResponseCache(
+            directory=Path(config.directories['cache']) / platform,
+            max_size=int(config.cache.get('max-size', 256)) * 1024 * 1024)
+        session.mount('https://', TLSCacheAdapter(
+            cache=cache, ttl=cache_config.get('ttl', 0), include=cache_config.get('include')))
+    else:
+        session.mount('https://', TLSAdapter())
+    return session
@@ -204,13 +204,14 @@ class CatchPlay(BaseService):
                     subtitle['url'] = subtitle_link
                     subtitles.append(subtitle)
 
-                download_files(subtitles)
+                download_files(
+                    subtitles, subtitle_format=self.subtitle_format)
             else:
                 mpd_url = data['videoUrl']
                 self.logger.debug('mpd_url: %s', mpd_url)
                 os.makedirs(folder_path, exist_ok=True)
                 self.ripprocess.download_subtitles_from_mpd(
-                    url=mpd_url, title=filename.replace('.vtt', ''), folder_path=folder_path, log_level=self.logger.level)
+                    url=mpd_url, title=filename.replace('.vtt', ''), folder_path=folder_path, log_level=self.logger.level, subtitle_format=self.subtitle_format)
         else:
             self.logger.error(res.text)
 
@@ -299,12 +299,10 @@ class FridayVideo(BaseService):
         if subtitles:
             headers = {'user-agent': user_agent,
                        'referer': 'https://video.friday.tw/'}
-            download_files(subtitles, headers)
-            if languages:
-                for lang_path in sorted(languages):
-                    convert_subtitle(
-                        folder_path=lang_path, subtitle_format=self.subtitle_format, locale=self.locale)
-            convert_subtitle(folder_path=folder_path,
+            download_files(
+                subtitles, headers, manifest=self.get_manifest(folder_path),
+                subtitle_format=self.subtitle_format)
+            convert_subtitle(folder_path=folder_path, languages=languages,
                              platform=self.platform, subtitle_format=self.subtitle_format, locale=self.locale)
 
     def main(self):
@@ -123,7 +123,7 @@ class HBOGOAsia(BaseService):
 
             folder_path = os.path.join(self.download_path, title)
 
-            if os.path.exists(folder_path):
+            if os.path.exists(folder_path) and not self.sync:
                 shutil.rmtree(folder_path)
 
             filename = f'{title}.WEB-DL.{self.platform}.vtt'
@@ -168,7 +168,7 @@ class HBOGOAsia(BaseService):
                     name = rename_filename(
                         f'{title}.S{str(season_index).zfill(2)}')
                     folder_path = os.path.join(self.download_path, name)
-                    if os.path.exists(folder_path):
+                    if os.path.exists(folder_path) and not self.sync:
                         shutil.rmtree(folder_path)
 
                     episode_res = self.session.get(url=season_url, timeout=5)
@@ -261,12 +261,10 @@ class HBOGOAsia(BaseService):
 
     def download_subtitle(self, subtitles, folder_path, languages=None):
         if subtitles:
-            download_files(subtitles)
-            if languages:
-                for lang_path in sorted(languages):
-                    convert_subtitle(
-                        folder_path=lang_path, subtitle_format=self.subtitle_format, locale=self.locale)
-            convert_subtitle(folder_path=folder_path,
+            download_files(
+                subtitles, manifest=self.get_manifest(folder_path),
+                subtitle_format=self.subtitle_format)
+            convert_subtitle(folder_path=folder_path, languages=languages,
                              platform=self.platform, subtitle_format=self.subtitle_format, locale=self.locale)
 
     def main(self):
@@ -67,7 +67,7 @@ class IQIYI(BaseService):
 
         folder_path = os.path.join(self.download_path, title)
 
-        if os.path.exists(folder_path):
+        if os.path.exists(folder_path) and not self.sync:
             shutil.rmtree(folder_path)
 
         filename = f'{title}.WEB-DL.{self.platform}.vtt'
@@ -168,7 +168,7 @@ class IQIYI(BaseService):
 
         folder_path = os.path.join(self.download_path, name)
 
-        if os.path.exists(folder_path):
+        if os.path.exists(folder_path) and not self.sync:
             shutil.rmtree(folder_path)
 
         languages = set()
@@ -325,11 +325,10 @@ class IQIYI(BaseService):
 
     def download_subtitle(self, subtitles, languages, folder_path):
         if subtitles and languages:
-            download_files(subtitles)
-            for lang_path in sorted(languages):
-                convert_subtitle(
-                    folder_path=lang_path, subtitle_format=self.subtitle_format, locale=self.locale)
-            convert_subtitle(folder_path=folder_path,
+            download_files(
+                subtitles, manifest=self.get_manifest(folder_path),
+                subtitle_format=self.subtitle_format)
+            convert_subtitle(folder_path=folder_path, languages=languages,
                              platform=self.platform, subtitle_format=self.subtitle_format, locale=self.locale)
 
     def main(self):
@@ -98,7 +98,9 @@ class iTunes(BaseService):
     def download_subtitle(self, subtitles, languages, folder_path):
         if subtitles and languages:
             self.logger.debug('subtitles: %s', subtitles)
-            download_files(subtitles)
+            download_files(
+                subtitles, manifest=self.get_manifest(folder_path),
+                subtitle_format=self.subtitle_format)
             display = True
             for lang_path in sorted(languages):
                 if 'tmp' in lang_path:
@@ -139,7 +141,7 @@ class iTunes(BaseService):
 
                 folder_path = os.path.join(self.download_path, title)
 
-                if os.path.exists(folder_path):
+                if os.path.exists(folder_path) and not self.sync:
                     shutil.rmtree(folder_path)
 
                 filename = f'{title}.WEB-DL.{self.platform}.vtt'
@@ -10,7 +10,7 @@ import re
 import sys
 import orjson
 from utils.io import rename_filename, download_files
-from utils.helper import get_locale, check_url_exist
+from utils.helper import get_locale
 from utils.subtitle import convert_subtitle
 from services.baseservice import BaseService
 
@@ -90,7 +90,6 @@ class KKTV(BaseService):
                         if fill_num < 2:
                             fill_num = 2
 
-                    languages = set()
                     subtitles = []
                     ja_lang = False
                     ko_lang = False
@@ -144,32 +143,26 @@ class KKTV(BaseService):
                                         ko_folder_path = os.path.join(
                                             folder_path, 'ko')
 
-                                        if check_url_exist(subtitle_link):
-                                            os.makedirs(
-                                                folder_path, exist_ok=True)
-
-                                            languages.add(folder_path)
-
-                                            subtitle = dict()
-                                            subtitle['name'] = filename
-                                            subtitle['path'] = folder_path
-                                            subtitle['url'] = subtitle_link
-                                            subtitles.append(subtitle)
+                                        os.makedirs(
+                                            folder_path, exist_ok=True)
+                                        subtitle = dict()
+                                        subtitle['name'] = filename
+                                        subtitle['path'] = folder_path
+                                        subtitle['url'] = subtitle_link
+                                        subtitles.append(subtitle)
 
-                                        if ja_lang and check_url_exist(ja_subtitle_link):
+                                        if ja_lang:
                                             os.makedirs(
                                                 ja_folder_path, exist_ok=True)
-                                            languages.add(ja_folder_path)
                                             subtitle = dict()
                                             subtitle['name'] = ja_filename
                                             subtitle['path'] = ja_folder_path
                                             subtitle['url'] = ja_subtitle_link
                                             subtitles.append(subtitle)
 
-                                        if ko_lang and check_url_exist(ko_subtitle_link):
+                                        if ko_lang:
                                             os.makedirs(
                                                 ko_folder_path, exist_ok=True)
-                                            languages.add(ko_folder_path)
                                             subtitle = dict()
                                             subtitle['name'] = ko_filename
                                             subtitle['path'] = ko_folder_path
@@ -177,15 +170,22 @@ class KKTV(BaseService):
                                             subtitles.append(subtitle)
 
                     self.download_subtitle(
-                        subtitles=subtitles, languages=languages, folder_path=folder_path)
-
-    def download_subtitle(self, subtitles, languages, folder_path):
-        if subtitles and languages:
-            download_files(subtitles)
-            for lang_path in sorted(languages):
-                convert_subtitle(
-                    folder_path=lang_path, subtitle_format=self.subtitle_format, locale=self.locale)
-            convert_subtitle(folder_path=folder_path,
+                        subtitles=subtitles, folder_path=folder_path)
+
+    def download_subtitle(self, subtitles, folder_path):
+        if subtitles:
+            results = download_files(
+                subtitles, manifest=self.get_manifest(folder_path),
+                subtitle_format=self.subtitle_format)
+            languages = set(os.path.dirname(result['path'])
+                            for result in results if result['ok'])
+            # ja/ko folders sort after folder_path, so remove them first
+            for lang_path in sorted(set(sub['path'] for sub in subtitles) - languages, reverse=True):
+                if os.path.isdir(lang_path) and not os.listdir(lang_path):
+                    os.rmdir(lang_path)
+            if not languages:
+                return
+            convert_subtitle(folder_path=folder_path, languages=languages,
                              platform=self.platform, subtitle_format=self.subtitle_format, locale=self.locale)
 
     def main(self):
@@ -69,7 +69,7 @@ class LineTV(BaseService):
                                      season_index,
                                      episode_num)
 
-            if os.path.exists(folder_path):
+            if os.path.exists(folder_path) and not self.sync:
                 shutil.rmtree(folder_path)
 
             if 'eps_info' in data:
@@ -115,7 +115,9 @@ class LineTV(BaseService):
 
     def download_subtitle(self, subtitles, folder_path):
         if subtitles:
-            download_files(subtitles)
+            download_files(
+                subtitles, manifest=self.get_manifest(folder_path),
+                subtitle_format=self.subtitle_format)
             convert_subtitle(folder_path=folder_path,
                              platform=self.platform, subtitle_format=self.subtitle_format, locale=self.locale)
 
@@ -179,12 +179,10 @@ class MeWatch(BaseService):
 
     def download_subtitle(self, subtitles, folder_path, languages=None):
         if subtitles:
-            download_files(subtitles)
-            if languages:
-                for lang_path in sorted(languages):
-                    convert_subtitle(
-                        folder_path=lang_path, subtitle_format=self.subtitle_format, locale=self.locale)
-            convert_subtitle(folder_path=folder_path,
+            download_files(
+                subtitles, manifest=self.get_manifest(folder_path),
+                subtitle_format=self.subtitle_format)
+            convert_subtitle(folder_path=folder_path, languages=languages,
                              platform=self.platform, subtitle_format=self.subtitle_format, locale=self.locale)
 
     def get_token(self):
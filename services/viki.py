@@ -122,7 +122,7 @@ class Viki(BaseService):
                                  season_index,
                                  episode_num)
 
-        if os.path.exists(folder_path):
+        if os.path.exists(folder_path) and not self.sync:
             shutil.rmtree(folder_path)
 
         languages = set()
@@ -202,6 +202,7 @@ class Viki(BaseService):
                                         exist_ok=True)
 
                             subtitles.append({
+                                'id': media_info['video']['id'],
                                 'name': filename.replace('.vtt', f'.{sub_lang}.vtt'),
                                 'path': lang_folder_path,
                                 'url': sub['src']
@@ -220,12 +221,10 @@ class Viki(BaseService):
 
     def download_subtitle(self, subtitles, folder_path, languages=None):
         if subtitles:
-            download_files(subtitles)
-            if languages:
-                for lang_path in sorted(languages):
-                    convert_subtitle(
-                        folder_path=lang_path, subtitle_format=self.subtitle_format, locale=self.locale)
-            convert_subtitle(folder_path=folder_path,
+            download_files(
+                subtitles, manifest=self.get_manifest(folder_path),
+                subtitle_format=self.subtitle_format)
+            convert_subtitle(folder_path=folder_path, languages=languages,
                              platform=self.platform, subtitle_format=self.subtitle_format, locale=self.locale)
 
     def main(self):
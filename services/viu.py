@@ -122,7 +122,7 @@ class Viu(BaseService):
                 f'{title}.S{str(season_index).zfill(2)}')
             folder_path = os.path.join(self.download_path, name)
 
-            if os.path.exists(folder_path):
+            if os.path.exists(folder_path) and not self.sync:
                 shutil.rmtree(folder_path)
 
             episode_num = data['series']['product_total']
@@ -352,17 +352,16 @@ class Viu(BaseService):
     def download_subtitle(self, subtitles, languages, folder_path):
         if subtitles and languages:
             self.logger.debug('subtitles: %s', subtitles)
-            download_files(subtitles)
+            download_files(
+                subtitles, manifest=self.get_manifest(folder_path),
+                subtitle_format=self.subtitle_format)
             display = True
             for lang_path in sorted(languages):
                 if 'tmp' in lang_path:
                     merge_subtitle_fragments(
                         folder_path=lang_path, filename=os.path.basename(lang_path.replace('tmp_', '')), subtitle_format=self.subtitle_format, locale=self.locale, display=display)
                     display = False
-                convert_subtitle(
-                    folder_path=lang_path, subtitle_format=self.subtitle_format, locale=self.locale)
-
-            convert_subtitle(folder_path=folder_path,
+            convert_subtitle(folder_path=folder_path, languages=languages,
                              platform=self.platform, subtitle_format=self.subtitle_format, locale=self.locale)
 
     def main(self):
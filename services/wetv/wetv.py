@@ -42,7 +42,7 @@ class WeTV(BaseService):
         title = rename_filename(f'{title}.{release_year}')
 
         folder_path = os.path.join(self.download_path, title)
-        if os.path.exists(folder_path):
+        if os.path.exists(folder_path) and not self.sync:
             shutil.rmtree(folder_path)
 
         filename = f'{title}.WEB-DL.{self.platform}.vtt'
@@ -110,7 +110,7 @@ class WeTV(BaseService):
         name = rename_filename(
             f'{title}.S{str(season_index).zfill(2)}')
         folder_path = os.path.join(self.download_path, name)
-        if os.path.exists(folder_path):
+        if os.path.exists(folder_path) and not self.sync:
             shutil.rmtree(folder_path)
 
         if len(episode_list) > 0:
@@ -263,11 +263,10 @@ class WeTV(BaseService):
 
     def download_subtitle(self, subtitles, languages, folder_path):
         if subtitles and languages:
-            download_files(subtitles)
-            for lang_path in sorted(languages):
-                convert_subtitle(
-                    folder_path=lang_path, subtitle_format=self.subtitle_format, locale=self.locale)
-            convert_subtitle(folder_path=folder_path,
+            download_files(
+                subtitles, manifest=self.get_manifest(folder_path),
+                subtitle_format=self.subtitle_format)
+            convert_subtitle(folder_path=folder_path, languages=languages,
                              platform=self.platform, subtitle_format=self.subtitle_format, locale=self.locale)
 
     def main(self):
@@ -5,15 +5,22 @@
 This module is to download subtitle from stream services.
 """
 import argparse
+import copy
 import logging
 from logging import INFO, DEBUG
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from datetime import datetime
+from functools import lru_cache
 import os
 import sys
+import threading
+import orjson
 import validators
 from configs.config import config, app_name, __version__, filenames
 from constants import Service
-from services import service_map
+from services import get_service_class, resolve
+from services.baseservice import create_session
 from utils.helper import get_locale
 from utils.io import load_toml
 
@@ -29,7 +36,18 @@ def main() -> None:
             support_services),
         add_help=False)
     parser.add_argument('url',
+                        nargs='?',
                         help=_("series's/movie's url"))
+    parser.add_argument('-b',
+                        '--batch',
+                        dest='batch',
+                        help=_("batch file of urls/JSON jobs (one per line), '-' reads stdin"))
+    parser.add_argument('-w',
+                        '--workers',
+                        dest='workers',
+                        type=int,
+                        default=4,
+                        help=_("number of concurrent batch jobs"))
     parser.add_argument('-s',
                         '--season',
                         dest='season',
@@ -43,6 +61,11 @@ def main() -> None:
                         dest='last_episode',
                         action='store_true',
                         help=_("download the latest episode"))
+    parser.add_argument('-sync',
+                        '--sync',
+                        dest='sync',
+                        action='store_true',
+                        help=_("only download episodes and languages not in the local manifest"))
     parser.add_argument('-o',
                         '--output',
                         dest='output',
@@ -93,6 +116,9 @@ def main() -> None:
 
     args = parser.parse_args()
 
+    if not args.url and not args.batch:
+        parser.error(_("the following arguments are required: url"))
+
     if args.debug:
         os.makedirs(config.directories['logs'], exist_ok=True)
         log_time = datetime.now().strftime('%Y-%m-%d_%H-%M-%S')
@@ -115,35 +141,163 @@ def main() -> None:
 
     start = datetime.now()
 
-    if not validators.url(args.url):
-        logging.warning(
-            _("\nPlease input correct url!"))
-        sys.exit(0)
+    if args.batch:
+        if not run_batch(args, _):
+            sys.exit(1)
+    else:
+        if not validators.url(args.url):
+            logging.warning(
+                _("\nPlease input correct url!"))
+            sys.exit(0)
 
-    service = next((service for service in service_map
-                   if service['domain'] in args.url), None)
+        if not resolve(args.url):
+            logging.warning(
+                _("\nOnly support downloading subtitles from %s ,and etc."), support_services)
+            sys.exit(1)
+
+        run(args)
+
+    logging.info("\n%s took %s seconds", app_name,
+                 int(float((datetime.now() - start).total_seconds())))
 
-    if service:
-        log = logging.getLogger(service['class'].__module__)
-        if args.debug:
-            log.setLevel(DEBUG)
-        else:
-            log.setLevel(INFO)
 
-        service_config = load_toml(
-            str(filenames.config).format(service=service['name']))
+@lru_cache(maxsize=None)
+def load_service_config(name):
+    """Load service config once per process"""
 
-        args.log = log
-        args.config = service_config
-        args.service = service
-        service['class'](args).main()
+    return load_toml(str(filenames.config).format(service=name))
+
+
+def run(args, session=None):
+    """Download subtitles of one url, return the service instance"""
+
+    service = resolve(args.url)
+
+    log = logging.getLogger(service['module'])
+    if args.debug:
+        log.setLevel(DEBUG)
     else:
-        logging.warning(
-            _("\nOnly support downloading subtitles from %s ,and etc."), support_services)
-        sys.exit(1)
+        log.setLevel(INFO)
 
-    logging.info("\n%s took %s seconds", app_name,
-                 int(float((datetime.now() - start).total_seconds())))
+    args.log = log
+    args.config = copy.deepcopy(load_service_config(service['name']))
+    args.service = service
+    args.session = session
+    instance = get_service_class(service)(args)
+    instance.main()
+    return instance
+
+
+def load_jobs(args):
+    """
+    Read batch jobs, one per line: JSON object with url and options
+    (e.g. {"url": "...", "season": "1", "subtitle_language": "en"}) or plain url;
+    options not given in a job fall back to the command line options
+    """
+
+    if args.batch == '-':
+        lines = sys.stdin.read().splitlines()
+    else:
+        with open(args.batch, 'r', encoding='utf-8') as file:
+            lines = file.read().splitlines()
+
+    # a job may set any command line option except the batch ones
+    options = set(vars(args)) - {'batch', 'workers'}
+
+    jobs = []
+    for number, line in enumerate(lines, start=1):
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if line.startswith('{'):
+            try:
+                job = orjson.loads(line)
+            except orjson.JSONDecodeError as error:
+                logging.error("\nInvalid batch job at line %s: %s", number, error)
+                sys.exit(1)
+            if not isinstance(job, dict) or 'url' not in job:
+                logging.error("\nInvalid batch job at line %s: missing url", number)
+                sys.exit(1)
+            unknown = set(job) - options
+            if unknown:
+                logging.error("\nInvalid batch job at line %s: unknown option(s) %s",
+                              number, ', '.join(sorted(unknown)))
+                sys.exit(1)
+        else:
+            job = {'url': line}
+        job_args = copy.copy(args)
+        for key, value in job.items():
+            setattr(job_args, key, value)
+        jobs.append(job_args)
+    return jobs
+
+
+def get_session_key(job_args):
+    """Jobs reuse sessions per service and proxy, set_proxy never mixes proxies"""
+
+    service = resolve(job_args.url) if validators.url(job_args.url) else None
+    if not service:
+        return None
+    return service['name'], job_args.proxy
+
+
+class SessionPool(object):
+    """
+    Idle sessions per service and proxy: a job checks one out for its whole
+    run, so concurrent jobs never share a session (service __init__ mutates
+    its headers, cookies and proxies) while later jobs reuse its connection
+    pool and cache
+    """
+
+    def __init__(self):
+        self.idle = {}
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def session(self, key):
+        with self.lock:
+            sessions = self.idle.setdefault(key, [])
+            session = sessions.pop() if sessions else None
+        if not session:
+            session = create_session(
+                key[0], load_service_config(key[0]).get('cache'))
+        try:
+            yield session
+        finally:
+            with self.lock:
+                self.idle[key].append(session)
+
+
+def run_batch(args, _):
+    """Run batch jobs on a bounded worker pool, reusing sessions per service"""
+
+    jobs = load_jobs(args)
+    sessions = SessionPool()
+
+    def run_job(job_args):
+        key = get_session_key(job_args)
+        if not key:
+            logging.warning(_("\nPlease input correct url!"))
+            return False
+        try:
+            with sessions.session(key) as session:
+                run(job_args, session=session)
+        except SystemExit as error:
+            return not error.code
+        except Exception:
+            logging.exception("%s failed", job_args.url)
+            return False
+        return True
+
+    with ThreadPoolExecutor(max_workers=args.workers) as executor:
+        results = list(executor.map(run_job, jobs))
+
+    failed = [job_args.url for job_args, ok in zip(jobs, results) if not ok]
+    logging.info("\nBatch: %s/%s job(s) succeeded",
+                 len(jobs) - len(failed), len(jobs))
+    for url in failed:
+        logging.info("Failed: %s", url)
+    return not failed
 
 
 if __name__ == "__main__":
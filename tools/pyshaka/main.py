@@ -1,6 +1,12 @@
-from typing import List
+import heapq
+import mmap
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager, nullcontext
+from typing import IO, Iterable, Iterator, List, Tuple
 from pathlib import Path
-from datetime import datetime
 from argparse import ArgumentParser
 
 from tools.pyshaka.util.TextParser import TimeContext
@@ -18,6 +24,9 @@ class CmdArgs:
         self.init_path = None  # type: str
         self.segments_path = None  # type: str
         self.segment_time = None  # type: float
+        self.init_data = None  # type: bytes
+        self.segments = None  # type: List[Tuple[str, bytes]]
+        self.workers = None  # type: int
 
 
 def command_handler(args: CmdArgs):
@@ -30,6 +39,7 @@ def command_handler(args: CmdArgs):
         args.init_path = args.init_path.strip()
     args.segments_path = args.segments_path.strip()
     args.segment_time = float(args.segment_time)
+    args.workers = int(args.workers)
 
 
 def loop_nestedCues(lines: List[str], nestedCues: List[Cue], index: int, segment_time: float):
@@ -66,7 +76,11 @@ def compare(cue: Cue):
 
 
 def gentm(tm: float):
-    return datetime.utcfromtimestamp(tm).strftime('%H:%M:%S.%f')[:-3]
+    '''
+    秒转成 HH:MM:SS.mmm 只用整数运算 不再经过datetime
+    '''
+    ms = round(tm * 1000000) // 1000
+    return '%02d:%02d:%02d.%03d' % (ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000)
 
 
 def test_parse_mp4vtt():
@@ -79,24 +93,45 @@ def test_parse_mp4vtt():
     mp4vttparser.parseMedia(vttSegment, timecontext)
 
 
-def parse(args: CmdArgs):
-    if args.type == 'wvtt':
-        parser = Mp4VttParser()
-    elif args.type == 'ttml':
-        parser = Mp4TtmlParser()
-    else:
-        assert 1 == 0, 'never should be here'
-    if args.init_path:
-        init_path = Path(args.init_path)
-        parser.parseInit(init_path.read_bytes())
-    else:
-        parser.set_timescale(args.timescale)
-    segments_path = Path(args.segments_path)
-    time = TimeContext(
-        **{'periodStart': 0, 'segmentStart': 0, 'segmentEnd': 0})
-    index = 0
-    cues = []
-    for segment_path in segments_path.iterdir():
+@contextmanager
+def map_segment(segment_path: Path):
+    '''
+    用mmap打开分段 由内核按需换页 不用先整个读进内存再复制一次
+    '''
+    with segment_path.open('rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield b''
+            return
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mm)
+        try:
+            yield view
+        except BaseException:
+            # 出错时traceback里的帧还引用着视图 交给gc关闭 不要盖掉原来的异常
+            view.release()
+            raise
+        view.release()
+        try:
+            mm.close()
+        except BufferError:
+            # 解析已经成功 只是还有视图没释放 记下来交给gc关闭 不让整条轨道失败
+            log.warning(f'{segment_path.name} is still referenced by a memoryview, leave it to gc')
+
+
+def segment_key(segment_path: Path):
+    '''
+    按文件名中的数字排序 2.mp4 排在 10.mp4 前面
+    '''
+    return [int(part) if part.isdigit() else part for part in re.split(r'(\d+)', segment_path.name)]
+
+
+def list_segments(args: CmdArgs) -> List[Path]:
+    '''
+    分段列表 排好序 index由排序决定而不是目录顺序
+    '''
+    init_name = Path(args.init_path).name if args.init_path else None
+    segment_paths = []
+    for segment_path in Path(args.segments_path).iterdir():
         if segment_path.is_dir():
             if args.debug:
                 log.debug(f'{segment_path} is not a file, skip it')
@@ -106,70 +141,233 @@ def parse(args: CmdArgs):
                 log.debug(
                     f"{segment_path} suffix is not in ['.mp4', '.m4s', '.dash', '.ts'], skip it")
             continue
-        if args.init_path and segment_path.name == init_path.name:
+        if init_name and segment_path.name == init_name:
             if args.debug:
                 log.debug(f"{segment_path} is init_path , skip it")
             continue
+        segment_paths.append(segment_path)
+    segment_paths.sort(key=segment_key)
+    return segment_paths
+
+
+def open_segment(segment):
+    '''
+    segment是分段路径就用mmap打开 否则当作内存中的分段
+    '''
+    if isinstance(segment, Path):
+        return map_segment(segment)
+    return nullcontext(segment)
+
+
+def create_parser(_type: str):
+    if _type == 'wvtt':
+        return Mp4VttParser()
+    elif _type == 'ttml':
+        return Mp4TtmlParser()
+    else:
+        assert 1 == 0, 'never should be here'
+
+
+def init_parser(args: CmdArgs):
+    parser = create_parser(args.type)
+    init_data = getattr(args, 'init_data', None)
+    if init_data:
+        parser.parseInit(init_data)
+    elif args.init_path:
+        with map_segment(Path(args.init_path)) as data:
+            parser.parseInit(data)
+    else:
+        parser.set_timescale(args.timescale)
+    return parser
+
+
+# 子进程里的解析器 由init_worker创建 每个进程只创建一次
+worker_parser = None
+
+# 并行解析时每个进程最少的分段数
+MIN_SEGMENTS_PER_WORKER = 32
+
+
+def init_worker(_type: str, timescale: int):
+    '''
+    init分段已经在主进程解析过了 子进程只需要timescale
+    '''
+    global worker_parser
+    worker_parser = create_parser(_type)
+    worker_parser.set_timescale(timescale)
+
+
+def parse_segment(segment) -> List[Cue]:
+    '''
+    在子进程中解析一个分段 segment是分段路径或者内存中的分段
+    '''
+    time = TimeContext(
+        **{'periodStart': 0, 'segmentStart': 0, 'segmentEnd': 0})
+    with open_segment(segment) as data:
+        return worker_parser.parseMedia(data, time)
+
+
+def iter_segment_cues(args: CmdArgs, parser):
+    '''
+    按index顺序返回(分段名, cues)
+    args.workers大于1时用进程池并行解析 为0时按CPU数量 结果顺序不变
+    进程数不超过 分段数 // MIN_SEGMENTS_PER_WORKER
+    '''
+    workers = getattr(args, 'workers', None)
+    segments = getattr(args, 'segments', None)
+    if segments is not None:
+        names = [name for name, _ in segments]
+        jobs = [data for _, data in segments]
+    else:
+        jobs = list_segments(args)
+        names = [segment_path.name for segment_path in jobs]
+    if workers == 0:
+        workers = os.cpu_count() or 1
+    # 子进程要spawn再导入一遍 每个进程至少分到这么多分段才划算 分段少就直接在本进程解析
+    workers = min(workers or 1, len(jobs) // MIN_SEGMENTS_PER_WORKER)
+
+    if workers > 1:
+        if args.debug:
+            log.debug(f'parseMedia for {len(jobs)} segments with {workers} processes')
+        chunksize = max(1, len(jobs) // (workers * 4))
+        # spawn而不是fork 调用方可能是多线程的(批量下载) fork会继承别的线程持有的锁
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_worker,
+                                 initargs=(args.type, getattr(parser, 'timescale_', None))) as executor:
+            yield from zip(names, executor.map(parse_segment, jobs, chunksize=chunksize))
+        return
+
+    time = TimeContext(
+        **{'periodStart': 0, 'segmentStart': 0, 'segmentEnd': 0})
+    for name, segment in zip(names, jobs):
         if args.debug:
-            log.debug(f'start parseMedia for {segment_path}')
-        _cues = parser.parseMedia(segment_path.read_bytes(), time)
+            log.debug(f'start parseMedia for {name}')
+        with open_segment(segment) as data:
+            yield name, parser.parseMedia(data, time)
 
+
+def iter_sorted_segments(args: CmdArgs) -> Iterator[List[Cue]]:
+    '''
+    按index顺序返回每个分段排好序的cue 没有cue的分段跳过
+    '''
+    parser = init_parser(args)
+    for index, (name, _cues) in enumerate(iter_segment_cues(args, parser)):
+        cues = []
         for cue in _cues:
-            cue.file = segment_path.name
+            cue.file = name
             if len(cue.nestedCues) > 0:
                 loop_nestedCues(cues, cue.nestedCues, index, args.segment_time)
             if cue.payload != '':
                 cue.startTime += args.segment_time * index
                 cue.endTime += args.segment_time * index
                 cues.append(cue)
-        index += 1
-    # 按Cue.startTime从小到大排序
-    cues.sort(key=compare)
+        if cues:
+            cues.sort(key=compare)
+            yield cues
+
+
+def merge_segments(args: CmdArgs) -> Iterator[Tuple[int, Cue]]:
+    '''
+    按Cue.startTime对各分段做k路归并 和utils.subtitle.merge_fragments一样
+    归并到某个分段的第一个cue时才去取它 返回(分段序号, cue)
+    前提是分段按序号的起始时间不减 否则结果不是有序的 由merge_cues兜底
+    '''
+    segments = iter_sorted_segments(args)
+    lookahead = next(segments, None)
+    heap = []
+    index = 0
+    while heap or lookahead:
+        while lookahead and (not heap or lookahead[0].startTime <= heap[0][0]):
+            cues = iter(lookahead)
+            cue = next(cues)
+            heapq.heappush(heap, (cue.startTime, index, cue, cues))
+            index += 1
+            lookahead = next(segments, None)
+
+        _startTime, index_, cue, cues = heap[0]
+        yield index_, cue
+        cue = next(cues, None)
+        if cue is not None:
+            heapq.heapreplace(heap, (cue.startTime, index_, cue, cues))
+        else:
+            heapq.heappop(heap)
+
+
+def merge_cues(args: CmdArgs) -> List[Cue]:
+    '''
+    按Cue.startTime排好序的全部cue startTime相同时保持分段顺序 和整体排序的结果一致
+    分段顺序乱了(比如自然排序和时间不一致 或者分段有重叠)就按(startTime, 分段序号)重新排序
+    和utils.subtitle.merge_subtitle_fragments的做法一样
+    '''
+    merged = list(merge_segments(args))
+    if any(prev.startTime > cue.startTime for (_, prev), (_, cue) in zip(merged, merged[1:])):
+        if args.debug:
+            log.debug('segments are out of order, sort all cues')
+        merged.sort(key=lambda item: (item[1].startTime, item[0]))
     if args.debug:
-        log.debug(f'cues count {len(cues)}')
-    assert len(cues) > 0, 'ohh, it is a bug...'
-    # 去重
-    # 1. 如果当前行的endTime等于下一行的startTime 并且下一行内容与当前行相同 取下一行的endTime作为当前行的endTime 然后去除下一行
-    # 2. 否则将下一行作为当前行 再次进行比较 直到比较结束
-    offset = 0
-    cues_fix = []  # type: List[Cue]
-    cue = cues[offset]
-    while offset < len(cues) - 1:
-        offset += 1
+        log.debug(f'cues count {len(merged)}')
+    return [cue for _, cue in merged]
+
+
+def dedup_cues(cues: Iterable[Cue]) -> Iterator[Cue]:
+    '''
+    去重
+    1. 如果当前行的endTime等于下一行的startTime 并且下一行内容与当前行相同 取下一行的endTime作为当前行的endTime 然后去除下一行
+    2. 否则将下一行作为当前行 再次进行比较 直到比较结束
+    边读边输出 不用先把全部结果放到列表里
+    '''
+    cue = None  # type: Cue
+    for next_cue in cues:
         # 跳过空的行
-        next_cue = cues[offset]
-        if cue.payload == '':
+        if cue is None or cue.payload == '':
             cue = next_cue
             continue
         if cue.payload == next_cue.payload and cue.endTime == next_cue.startTime:
             cue.endTime = next_cue.endTime
         else:
-            cues_fix.append(cue)
+            yield cue
             cue = next_cue
+    assert cue is not None, 'ohh, it is a bug...'
     # 最后一行也不能掉
-    next_cue = cues[offset]
-    if cue.payload == next_cue.payload and cue.endTime == next_cue.startTime:
-        cue.endTime = next_cue.endTime
-    else:
-        cues_fix.append(cue)
-        cue = next_cue
-    if args.debug:
-        log.debug(
-            f'after reduce duplicated lines, now lines count is {len(cues_fix)}')
-    # 先用列表放内容 最后join
-    contents = ["WEBVTT"]  # type: List[str]
-    for cue in cues_fix:
+    if cue.payload != '':
+        yield cue
+
+
+def iter_cues(args: CmdArgs) -> Iterator[Cue]:
+    return dedup_cues(merge_cues(args))
+
+
+def write_vtt(cues: Iterable[Cue], fp: IO[str]) -> int:
+    '''
+    逐行写入WebVTT 返回写入的行数
+    '''
+    count = 0
+    fp.write('WEBVTT')
+    for cue in cues:
         settings = cue._settings
         if settings:
-            settings = ' ' + settings
-            text = f'{gentm(cue.startTime)} --> {gentm(cue.endTime)}{settings}\n{cue.payload}'
+            fp.write(f'\n\n{gentm(cue.startTime)} --> {gentm(cue.endTime)} {settings}\n{cue.payload}')
         else:
-            text = f'{gentm(cue.startTime)} --> {gentm(cue.endTime)}\n{cue.payload}'
-        contents.append(text)
-    content = '\n\n'.join(contents)
-    segments_path.with_suffix(".vtt").write_text(content, encoding='utf-8')
-    log.info(f'{len(cues_fix)} lines of subtitle was founded.')
-    log.info(f'write to {segments_path.with_suffix(".vtt").resolve()}')
+            fp.write(f'\n\n{gentm(cue.startTime)} --> {gentm(cue.endTime)}\n{cue.payload}')
+        count += 1
+    return count
+
+
+def parse(args: CmdArgs):
+    vtt_path = Path(args.segments_path).with_suffix('.vtt')
+    # 先写到临时文件 解析出错时不会留下写了一半的vtt
+    tmp_path = vtt_path.with_suffix('.vtt.tmp')
+    try:
+        with tmp_path.open('w', encoding='utf-8') as fp:
+            count = write_vtt(iter_cues(args), fp)
+        os.replace(tmp_path, vtt_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    if args.debug:
+        log.debug(
+            f'after reduce duplicated lines, now lines count is {count}')
+    log.info(f'{count} lines of subtitle was founded.')
+    log.info(f'write to {vtt_path.resolve()}')
 
 
 def main():
@@ -191,6 +389,8 @@ def main():
                         help='segments folder path')
     parser.add_argument('-segment-time', '--segment-time', default='0',
                         help='single segment duration, usually needed for ttml content, calculation method: d / timescale')
+    parser.add_argument('-workers', '--workers', default='1',
+                        help='parse segments with N processes, 0 means the number of CPUs')
     args = parser.parse_args()  # type: CmdArgs
     command_handler(args)
     parse(args)
@@ -83,66 +83,115 @@ class textDecoration(Enum):
     OVERLINE = 'overline'
 
 
+# 样式字段的默认值 所有Cue共享 只有被赋值(写)时才存到Cue自己的_style里
+DEFAULT_STYLE = {
+    'direction': direction.HORIZONTAL_LEFT_TO_RIGHT,
+    'position': None,
+    'positionAlign': positionAlign.AUTO,
+    'size': 0,
+    'textAlign': textAlign.CENTER,
+    'writingMode': writingMode.HORIZONTAL_TOP_TO_BOTTOM,
+    'lineInterpretation': lineInterpretation.LINE_NUMBER,
+    'line': None,
+    'lineHeight': '',
+    'lineAlign': lineAlign.START,
+    'displayAlign': displayAlign.AFTER,
+    'color': '',
+    'backgroundColor': '',
+    'backgroundImage': '',
+    'border': '',
+    'fontSize': '',
+    'fontWeight': fontWeight.NORMAL,
+    'fontStyle': fontStyle.NORMAL,
+    'fontFamily': '',
+    'letterSpacing': '',
+    'linePadding': '',
+    'opacity': 1,
+    'wrapLine': True,
+    'id': '',
+    'lineBreak': False,
+    'spacer': False,
+}
+
+# 可变的默认值不能共享 第一次读取时为该Cue单独创建
+MUTABLE_STYLE = {
+    'region': lambda: CueRegion(),
+    'textDecoration': list,
+    'nestedCues': list,
+    'cellResolution': lambda: {'columns': 32, 'rows': 15},
+}
+
+
+STYLE_FIELDS = tuple(DEFAULT_STYLE) + tuple(MUTABLE_STYLE)
+
+
+def style_property(name: str):
+    default = DEFAULT_STYLE.get(name)
+    factory = MUTABLE_STYLE.get(name)
+
+    def getter(self: 'Cue'):
+        style = self._style
+        if style is not None and name in style:
+            if factory is not None and not self._own:
+                # 共享中的可变值 交出去之前先复制一份 避免改到别的Cue
+                return self._own_style()[name]
+            return style[name]
+        if factory is None:
+            return default
+        value = factory()
+        self._own_style()[name] = value
+        return value
+
+    def setter(self: 'Cue', value):
+        self._own_style()[name] = value
+
+    return property(getter, setter)
+
+
 class Cue:
 
+    __slots__ = ('startTime', 'endTime', 'payload', '_settings', 'file', '_style', '_own')
+
     def __init__(self, startTime: float, endTime: float, payload: str, _settings: str = ''):
         self.startTime = startTime
-        self.direction = direction.HORIZONTAL_LEFT_TO_RIGHT
         self.endTime = endTime
         self.payload = payload
-        self.region = CueRegion()
-        self.position = None
-        self.positionAlign = positionAlign.AUTO
-        self.size = 0
-        self.textAlign = textAlign.CENTER
-        self.writingMode = writingMode.HORIZONTAL_TOP_TO_BOTTOM
-        self.lineInterpretation = lineInterpretation.LINE_NUMBER
-        self.line = None
-        self.lineHeight = ''
-        self.lineAlign = lineAlign.START
-        self.displayAlign = displayAlign.AFTER
-        self.color = ''
-        self.backgroundColor = ''
-        self.backgroundImage = ''
-        self.border = ''
-        self.fontSize = ''
-        self.fontWeight = fontWeight.NORMAL
-        self.fontStyle = fontStyle.NORMAL
-        self.fontFamily = ''
-        self.letterSpacing = ''
-        self.linePadding = ''
-        self.opacity = 1
-        self.textDecoration = []
-        self.wrapLine = True
-        self.id = ''
-        self.nestedCues = []
-        self.lineBreak = False
-        self.spacer = False
-        self.cellResolution = {'columns': 32, 'rows': 15}
         self._settings = _settings
+        self.file = ''
+        # 只保存与默认值不同的样式字段 没有写过样式时为None
+        # clone出来的Cue与原Cue共享_style 谁先写谁复制(copy-on-write)
+        self._style = None  # type: dict
+        self._own = False
+
+    def _own_style(self) -> dict:
+        if self._style is None:
+            self._style = {}
+        elif not self._own:
+            self._style = {k: v.copy() if isinstance(v, list) else v for k, v in self._style.items()}
+        self._own = True
+        return self._style
 
     @staticmethod
-    def lineBreak(start: float, end: float) -> 'Cue':
+    def makeLineBreak(start: float, end: float) -> 'Cue':
+        # 原先叫lineBreak 与lineBreak字段同名 改为property后改名
         cue = Cue(start, end, '')
         cue.lineBreak = True
         return cue
 
     def clone(self):
-        cue = Cue(0, 0, '')
-        for k, v in self.__dict__.items():
-            if isinstance(v, list):
-                v = v.copy()
-            cue.__setattr__(k, v)
+        cue = Cue(self.startTime, self.endTime, self.payload, self._settings)
+        cue.file = self.file
+        if self._style:
+            cue._style = self._style
+            self._own = False
         return cue
 
     @staticmethod
     def equal(cue1: 'Cue', cue2: 'Cue') -> bool:
         if cue1.startTime != cue2.startTime or cue1.endTime != cue2.endTime or cue1.payload != cue2.payload:
             return False
-        for k, v in cue1.__dict__.items():
-            if k == 'startTime' or k == 'endTime' or k == 'payload':
-                pass
-            elif k == 'nestedCues':
+        for k in STYLE_FIELDS:
+            if k == 'nestedCues':
                 if not Cue.equal(cue1.nestedCues, cue2.nestedCues):
                     return False
             elif k == 'region' or k == 'cellResolution':
@@ -158,6 +207,10 @@ class Cue:
         return True
 
 
+for _name in STYLE_FIELDS:
+    setattr(Cue, _name, style_property(_name))
+
+
 class units(Enum):
     PX = 0
     PERCENTAGE = 1
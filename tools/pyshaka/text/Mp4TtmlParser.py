@@ -10,7 +10,12 @@ from tools.pyshaka.util.TextParser import TimeContext
 class Mp4TtmlParser:
 
     def __init__(self):
-        self.parser_ = TtmlTextParser()
+        self.parser_ = TtmlTextParser(cacheHead=True)
+        # mdat解析计划只构建一次 每个分段复用
+        self.mediaParser_ = Mp4Parser().box('mdat', Mp4Parser.allData(self.mdat_))
+        self.time_ = None  # type: TimeContext
+        self.payload_ = []  # type: List[Cue]
+        self.sawMDAT_ = False
 
     def set_timescale(self, timescale: int):
         pass
@@ -41,20 +46,16 @@ class Mp4TtmlParser:
         if not sawSTPP:
             raise InvalidMp4TTML(f'is sawSTPP? {sawSTPP}')
 
-    def parseMedia(self, data: memoryview, time: TimeContext, dont_raise: bool = True) -> List[Cue]:
-
-        def mdat_callback(data: bytes):
-            nonlocal payload
-            nonlocal sawMDAT
-            sawMDAT = True
-            payload.extend(self.parser_.parseMedia(data, time))
-
-        sawMDAT = False
-        payload = []
+    def mdat_(self, data: bytes):
+        self.sawMDAT_ = True
+        self.payload_.extend(self.parser_.parseMedia(data, self.time_))
 
-        mp4parser = Mp4Parser()
-        mp4parser = mp4parser.box('mdat', Mp4Parser.allData(mdat_callback))
-        mp4parser = mp4parser.parse(data, partialOkay=False)
+    def parseMedia(self, data: memoryview, time: TimeContext, dont_raise: bool = True) -> List[Cue]:
+        self.time_ = time
+        self.payload_ = payload = []
+        self.sawMDAT_ = False
+        self.mediaParser_.parse(data, partialOkay=False)
+        sawMDAT = self.sawMDAT_
 
         if not sawMDAT:
             if dont_raise:
@@ -14,10 +14,28 @@ from tools.pyshaka.util.exceptions import InvalidMp4VTT
 from tools.pyshaka.log import log
 
 
+VTTC = Mp4Parser.typeFromString_('vttc')
+VTTE = Mp4Parser.typeFromString_('vtte')
+
+
 class Mp4VttParser:
 
     def __init__(self):
         self.timescale_ = None  # type: int
+        # 解析计划只构建一次 每个分段复用 回调把结果写到实例上
+        self.mediaParser_ = Mp4Parser() \
+            .box('moof', Mp4Parser.children) \
+            .box('traf', Mp4Parser.children) \
+            .fullBox('tfdt', self.tfdt_) \
+            .fullBox('tfhd', self.tfhd_) \
+            .fullBox('trun', self.trun_) \
+            .box('mdat', Mp4Parser.allData(self.mdat_))
+        self.vttcParser_ = Mp4Parser() \
+            .box('payl', Mp4Parser.allData(self.payl_)) \
+            .box('iden', Mp4Parser.allData(self.iden_)) \
+            .box('sttg', Mp4Parser.allData(self.sttg_))
+        self.resetMedia_()
+        self.resetVTTC_()
 
     def set_timescale(self, timescale: int):
         self.timescale_ = timescale
@@ -57,61 +75,58 @@ class Mp4VttParser:
             raise InvalidMp4VTT(
                 'A WVTT box should have been seen (a valid vtt init segment with no actual subtitles')
 
-    def parseMedia(self, data: memoryview, time: TimeContext) -> List[Cue]:
+    def resetMedia_(self):
+        self.baseTime_ = 0
+        self.presentations_ = []  # type: List[ParsedTRUNSample]
+        self.rawPayload_ = b''  # type: bytes
+        self.sawTFDT_ = False
+        self.sawTRUN_ = False
+        self.sawMDAT_ = False
+        self.defaultDuration_ = None
+
+    def tfdt_(self, box: ParsedBox):
+        self.sawTFDT_ = True
+        assert box.version == 0 or box.version == 1, 'TFDT version can only be 0 or 1'
+        parsedTFDTBox = Mp4BoxParsers.parseTFDT(box.reader, box.version)
+        self.baseTime_ = parsedTFDTBox.baseMediaDecodeTime
+
+    def tfhd_(self, box: ParsedBox):
+        assert box.flags is not None, 'A TFHD box should have a valid flags value'
+        parsedTFHDBox = Mp4BoxParsers.parseTFHD(box.reader, box.flags)
+        self.defaultDuration_ = parsedTFHDBox.defaultSampleDuration
+
+    def trun_(self, box: ParsedBox):
+        self.sawTRUN_ = True
+        assert box.version is not None, 'A TRUN box should have a valid version value'
+        assert box.version is not None, 'A TRUN box should have a valid flags value'
+        parsedTRUNBox = Mp4BoxParsers.parseTRUN(
+            box.reader, box.version, box.flags)
+        self.presentations_ = parsedTRUNBox.sampleData
+
+    def mdat_(self, data: bytes):
+        assert not self.sawMDAT_, 'VTT cues in mp4 with multiple MDAT are not currently supported'
+        self.sawMDAT_ = True
+        self.rawPayload_ = data
 
-        def tfdt_callback(box: ParsedBox):
-            nonlocal baseTime
-            nonlocal sawTFDT
-            sawTFDT = True
-            assert box.version == 0 or box.version == 1, 'TFDT version can only be 0 or 1'
-            parsedTFDTBox = Mp4BoxParsers.parseTFDT(box.reader, box.version)
-            baseTime = parsedTFDTBox.baseMediaDecodeTime
-
-        def tfhd_callback(box: ParsedBox):
-            nonlocal defaultDuration
-            assert box.flags is not None, 'A TFHD box should have a valid flags value'
-            parsedTFHDBox = Mp4BoxParsers.parseTFHD(box.reader, box.flags)
-            defaultDuration = parsedTFHDBox.defaultSampleDuration
-
-        def trun_callback(box: ParsedBox):
-            nonlocal sawTRUN
-            nonlocal presentations
-            sawTRUN = True
-            assert box.version is not None, 'A TRUN box should have a valid version value'
-            assert box.version is not None, 'A TRUN box should have a valid flags value'
-            parsedTRUNBox = Mp4BoxParsers.parseTRUN(
-                box.reader, box.version, box.flags)
-            presentations = parsedTRUNBox.sampleData
-
-        def mdat_callback(data: bytes):
-            nonlocal sawMDAT
-            nonlocal rawPayload
-            assert not sawMDAT, 'VTT cues in mp4 with multiple MDAT are not currently supported'
-            sawMDAT = True
-            rawPayload = data
+    def parseMedia(self, data: memoryview, time: TimeContext) -> List[Cue]:
 
         if not self.timescale_:
             raise InvalidMp4VTT('No init segment for MP4+VTT!')
 
-        baseTime = 0
-        presentations = []  # type: List[ParsedTRUNSample]
-        rawPayload = b''  # type: bytes
+        self.resetMedia_()
+        self.mediaParser_.parse(data, partialOkay=False)
+
+        baseTime = self.baseTime_
+        presentations = self.presentations_
+        rawPayload = self.rawPayload_
+        defaultDuration = self.defaultDuration_
+        sawTFDT = self.sawTFDT_
+        sawTRUN = self.sawTRUN_
+        sawMDAT = self.sawMDAT_
+        # 不持有分段buffer 避免mmap无法关闭
+        self.resetMedia_()
         cues = []  # type: List[Cue]
 
-        sawTFDT = False
-        sawTRUN = False
-        sawMDAT = False
-        defaultDuration = None
-
-        mp4parser = Mp4Parser()
-        mp4parser = mp4parser.box('moof', Mp4Parser.children)
-        mp4parser = mp4parser.box('traf', Mp4Parser.children)
-        mp4parser = mp4parser.fullBox('tfdt', tfdt_callback)
-        mp4parser = mp4parser.fullBox('tfhd', tfhd_callback)
-        mp4parser = mp4parser.fullBox('trun', trun_callback)
-        mp4parser = mp4parser.box('mdat', Mp4Parser.allData(mdat_callback))
-        mp4parser = mp4parser.parse(data, partialOkay=False)
-
         if not sawMDAT and not sawTFDT and not sawTRUN:
             raise InvalidMp4VTT(
                 f'A required box is missing. Is saw: MDAT {sawMDAT} TFDT {sawTFDT} TRUN {sawTRUN}')
@@ -133,24 +148,23 @@ class Mp4VttParser:
                 totalSize += payloadSize
                 # Skip the type.
                 payloadType = reader.readUint32()
-                payloadName = Mp4Parser.typeToString(payloadType)
 
                 # Read the data payload.
                 payload = None
-                if payloadName == 'vttc':
+                if payloadType == VTTC:
                     if payloadSize > 8:
-                        payload = reader.readBytes(payloadSize - 8)
-                elif payloadName == 'vtte':
+                        payload = reader.readView(payloadSize - 8)
+                elif payloadType == VTTE:
                     # It's a vtte, which is a vtt cue that is empty. Ignore any data that does exist.
                     reader.skip(payloadSize - 8)
                 else:
-                    log.error(f'Unknown box {payloadName}! Skipping!')
+                    log.error(f'Unknown box {Mp4Parser.typeToString(payloadType)}! Skipping!')
                     reader.skip(payloadSize - 8)
 
                 if duration:
                     if payload:
                         assert self.timescale_ is not None, 'Timescale should not be null!'
-                        cue = Mp4VttParser.parseVTTC_(
+                        cue = self.parseVTTC_(
                             payload,
                             time.periodStart + startTime / self.timescale_,
                             time.periodStart + currentTime / self.timescale_
@@ -171,33 +185,26 @@ class Mp4VttParser:
         # parseVTTC_ 有可能返回的是 None 这里过滤一下
         return [cue for cue in cues if cue]
 
-    @staticmethod
-    def parseVTTC_(data: bytes, startTime: float, endTime: float):
-
-        def payl_callback(data: bytes):
-            nonlocal payload
-            payload = data.decode('utf-8')
+    def resetVTTC_(self):
+        self.payload_ = None
+        self.id_ = None
+        self.settings_ = None
 
-        def iden_callback(data: bytes):
-            nonlocal _id
-            _id = data.decode('utf-8')
+    def payl_(self, data: bytes):
+        self.payload_ = str(data, 'utf-8')
 
-        def sttg_callback(data: bytes):
-            nonlocal settings
-            settings = data.decode('utf-8')
+    def iden_(self, data: bytes):
+        self.id_ = str(data, 'utf-8')
 
-        payload = None
-        _id = None
-        settings = None
+    def sttg_(self, data: bytes):
+        self.settings_ = str(data, 'utf-8')
 
-        mp4parser = Mp4Parser()
-        mp4parser = mp4parser.box('payl', Mp4Parser.allData(payl_callback))
-        mp4parser = mp4parser.box('iden', Mp4Parser.allData(iden_callback))
-        mp4parser = mp4parser.box('sttg', Mp4Parser.allData(sttg_callback))
-        mp4parser = mp4parser.parse(data)
+    def parseVTTC_(self, data: bytes, startTime: float, endTime: float):
+        self.resetVTTC_()
+        self.vttcParser_.parse(data)
 
-        if payload:
-            return Mp4VttParser.assembleCue_(payload, _id, settings, startTime, endTime)
+        if self.payload_:
+            return Mp4VttParser.assembleCue_(self.payload_, self.id_, self.settings_, startTime, endTime)
         else:
             return None
 
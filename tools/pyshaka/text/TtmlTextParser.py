@@ -1,17 +1,17 @@
 import re
-from xml.dom.minidom import parseString, Element, Node, Document
+import traceback
 from enum import Enum
-from typing import List, Union
+from typing import Dict, Iterator, List, Tuple, Union
+from xml.etree.ElementTree import ParseError
 
 from tools.pyshaka.text.Cue import Cue, CueRegion, units, direction, writingMode
 from tools.pyshaka.text.Cue import textAlign, lineAlign, positionAlign, displayAlign
-from tools.pyshaka.text.Cue import fontStyle, textDecoration
+from tools.pyshaka.text.Cue import fontStyle, fontWeight, textDecoration
 from tools.pyshaka.util.TextParser import TimeContext
+from tools.pyshaka.util.XmlUtils import XmlNode, localName, readEvents
 from tools.pyshaka.util.exceptions import InvalidXML, InvalidTextCue
 from tools.pyshaka.log import log
 
-document = Document()
-
 
 class RateInfo_:
     def __init__(self, frameRate: str, subFrameRate: str, frameRateMultiplier: str, tickRate: str):
@@ -42,119 +42,301 @@ class RateInfo_:
                 self.frameRate *= multiplierNum
 
 
-class TtmlTextParser:
+class StyleResolver_:
+    '''
+    样式/区域解析缓存 一个head只建一个
+    同样的style引用和region引用只沿着style链解析一次
+    '''
 
-    def parseInit(self):
-        assert False, 'TTML does not have init segments'
+    def __init__(self, styles: List[XmlNode], regionElements: List[XmlNode], cueRegions: List[CueRegion]):
+        self.stylesById_ = {}  # type: Dict[str, XmlNode]
+        for style in styles:
+            self.stylesById_.setdefault(style.getAttribute('xml:id'), style)
+        self.regionsById_ = {}  # type: Dict[str, XmlNode]
+        for region in regionElements:
+            self.regionsById_.setdefault(region.getAttribute('xml:id'), region)
+        self.cueRegionsById_ = {}  # type: Dict[str, CueRegion]
+        for cueRegion in cueRegions:
+            self.cueRegionsById_.setdefault(cueRegion.id, cueRegion)
+        # (style引用, 属性名) -> 值
+        self.inherited_ = {}  # type: Dict[Tuple[str, str], str]
+        # (style引用, region, 是否继承region样式) -> {属性名: 值}
+        self.computed_ = {}  # type: Dict[tuple, Dict[str, str]]
+        # region引用 -> (region元素, CueRegion)
+        self.regions_ = {}  # type: Dict[str, Tuple[XmlNode, CueRegion]]
+
+    def getInheritedStyleAttribute(self, styleRef: str, attribute: str):
+        key = (styleRef, attribute)
+        try:
+            return self.inherited_[key]
+        except KeyError:
+            pass
+        # 先占位 style循环引用时返回None 而不是无限递归
+        self.inherited_[key] = None
+        styleValue = None
+        if styleRef:
+            # The last value in our styles stack takes the precedence over the others
+            for name in styleRef.split(' '):
+                inheritedStyle = self.stylesById_.get(name)
+                if inheritedStyle is None:
+                    continue
+                # Check ebu namespace first, fall back to tts namespace.
+                styleAttributeValue = inheritedStyle.getAttributeNS(styleEbuttsNs_, attribute) or \
+                    inheritedStyle.getAttributeNS(styleNs_, attribute)
+                if not styleAttributeValue:
+                    # Styles can inherit from other styles, so traverse up that chain.
+                    styleAttributeValue = self.getInheritedStyleAttribute(
+                        TtmlTextParser.getInheritedAttribute_(inheritedStyle, 'style', None), attribute)
+                if styleAttributeValue:
+                    styleValue = styleAttributeValue
+        self.inherited_[key] = styleValue
+        return styleValue
 
-    def parseMedia(self, data: bytes, time: TimeContext) -> List[Cue]:
-        ttpNs = parameterNs_
-        ttsNs = styleNs_
-        text = data.decode('utf-8')
-        cues = []  # type: List[Cue]
-        xml = None
+    def getStyleAttributeFromElement(self, element: XmlNode, attribute: str):
+        return element.getAttributeNS(styleNs_, attribute) or self.getInheritedStyleAttribute(
+            TtmlTextParser.getInheritedAttribute_(element, 'style', None), attribute)
 
-        if text == '':
-            return cues
-        try:
-            xml = parseString(text)
-        except Exception as e:
-            log.error('xml parseString', exc_info=e)
-        if xml is None:
-            return cues
-        parsererrors = xml.getElementsByTagName(
-            'parsererror')  # type: List[Element]
-        if len(parsererrors) > 0 and parsererrors[0]:
-            raise InvalidXML('ttml parsererror')
-        tts = xml.getElementsByTagName('tt')  # type: List[Element]
-        if len(tts) == 0:
-            raise InvalidXML('TTML does not contain <tt> tag.')
-        tt = tts[0]
-        bodys = tt.getElementsByTagName('body')  # type: List[Element]
-        if len(bodys) == 0:
-            return []
+    def getStyleAttributeFromRegion(self, region: XmlNode, attribute: str):
+        if not region:
+            return None
+        return self.getStyleAttributeFromElement(region, attribute)
+
+    def getStyle(self, cueElement: XmlNode, region: XmlNode, shouldInheritRegionStyles: bool) -> Dict[str, str]:
+        '''
+        cue最终用到的样式 元素自己的tts属性优先 然后是style链 最后是region
+        '''
+        styleRef = TtmlTextParser.getInheritedAttribute_(cueElement, 'style', None)
+        key = (styleRef, region, shouldInheritRegionStyles)
+        style = self.computed_.get(key)
+        if style is None:
+            style = {}
+            for attribute in styleAttributes_:
+                value = self.getInheritedStyleAttribute(styleRef, attribute)
+                if not value and shouldInheritRegionStyles:
+                    value = self.getStyleAttributeFromRegion(region, attribute)
+                style[attribute] = value
+            self.computed_[key] = style
+        attributes = cueElement.attributes
+        if attributes:
+            computed = style
+            for attribute, name in styleAttributeNames_:
+                value = attributes.get(name)
+                if value:
+                    if computed is style:
+                        computed = dict(style)
+                    computed[attribute] = value
+            style = computed
+        return style
+
+    def getRegion(self, cueElement: XmlNode) -> Tuple[XmlNode, CueRegion]:
+        regionRef = TtmlTextParser.getInheritedAttribute_(cueElement, 'region', None)
+        region = self.regions_.get(regionRef)
+        if region is None:
+            region = (None, None)
+            for name in (regionRef.split(' ') if regionRef else []):
+                regionElement = self.regionsById_.get(name)
+                if regionElement is None:
+                    continue
+                regionId = regionElement.getAttribute('xml:id')
+                if regionId:
+                    region = (regionElement, self.cueRegionsById_[regionId])
+                break
+            self.regions_[regionRef] = region
+        return region
+
+
+class TtmlHead_:
+    '''
+    body之前解析出来的内容 分段的head完全相同时可以直接复用
+    '''
+
+    def __init__(self, tt: XmlNode, metadataElements: List[XmlNode], styles: List[XmlNode], regionElements: List[XmlNode]):
+        ttpNs = parameterNs_
         frameRate = tt.getAttributeNS(ttpNs, 'frameRate')
         subFrameRate = tt.getAttributeNS(ttpNs, 'subFrameRate')
         frameRateMultiplier = tt.getAttributeNS(ttpNs, 'frameRateMultiplier')
         tickRate = tt.getAttributeNS(ttpNs, 'tickRate')
         cellResolution = tt.getAttributeNS(ttpNs, 'cellResolution')
         spaceStyle = tt.getAttribute('xml:space') or 'default'
-        extent = tt.getAttributeNS(ttsNs, 'extent')
+        extent = tt.getAttributeNS(styleNs_, 'extent')
 
         if spaceStyle != 'default' and spaceStyle != 'preserve':
             raise InvalidXML(f'Invalid xml:space value: {spaceStyle}')
-        whitespaceTrim = spaceStyle == 'default'
-        rateInfo = RateInfo_(frameRate, subFrameRate,
-                             frameRateMultiplier, tickRate)
-        cellResolutionInfo = TtmlTextParser.getCellResolution_(cellResolution)
-
-        metadatas = tt.getElementsByTagName('metadata')  # type: List[Element]
-        metadataElements = []
-        if len(metadatas) > 0:
-            for childNode in metadatas[0].childNodes:
-                if isinstance(childNode, Element):
-                    metadataElements.append(childNode)
-        styles = tt.getElementsByTagName('style')  # type: List[Element]
-        regionElements = tt.getElementsByTagName(
-            'region')  # type: List[Element]
-        cueRegions = []
+        self.tt = tt
+        self.whitespaceTrim = spaceStyle == 'default'
+        self.rateInfo = RateInfo_(frameRate, subFrameRate,
+                                  frameRateMultiplier, tickRate)
+        self.cellResolutionInfo = TtmlTextParser.getCellResolution_(cellResolution)
+        self.metadataElements = metadataElements
 
+        cueRegions = []
         for region in regionElements:
             cueRegion = TtmlTextParser.parseCueRegion_(region, styles, extent)
             if cueRegion:
                 cueRegions.append(cueRegion)
+        self.resolver = StyleResolver_(styles, regionElements, cueRegions)
+
 
-        body = bodys[0]
-        if len([childNode for childNode in body.childNodes if isinstance(childNode, Element) and childNode.tagName == 'p']) > 0:
-            raise InvalidTextCue('<p> can only be inside <div> in TTML')
-        for divNode in body.childNodes:
-            if isinstance(divNode, Element) is False:
+class TtmlTextParser:
+
+    def __init__(self, cacheHead: bool = False):
+        '''
+        cacheHead 分段的TTML每段都会带一样的head 打开后head相同就不再重复解析
+        '''
+        self.cacheHead_ = cacheHead
+        self.headCache_ = None  # type: Tuple[bytes, TtmlHead_]
+
+    def parseInit(self):
+        assert False, 'TTML does not have init segments'
+
+    def parseMedia(self, data: bytes, time: TimeContext) -> List[Cue]:
+        try:
+            return list(self.iterCues(data, time))
+        except ParseError as e:
+            log.error('xml parseString', exc_info=e)
+            # XMLPullParser.read_events的帧引用着异常本身 成环后分段的视图要等gc才释放
+            traceback.clear_frames(e.__traceback__)
+            return []
+
+    def iterCues(self, data: bytes, time: TimeContext) -> Iterator[Cue]:
+        '''
+        流式解析 不再用minidom建整棵树
+        head里的style/region/metadata在body开始前就已经读完
+        body里每个<p>(或者没有<p>的<div>)结束时就生成cue 然后丢掉对应的元素
+        '''
+        if len(data) == 0:
+            return
+
+        head = None  # type: TtmlHead_
+        headKey = None  # type: bytes
+        if self.cacheHead_:
+            headKey = TtmlTextParser.getHeadKey_(data)
+            if headKey is not None and self.headCache_ and self.headCache_[0] == headKey:
+                head = self.headCache_[1]
+
+        tt = None  # type: XmlNode
+        body = None  # type: XmlNode
+        div = None  # type: XmlNode
+        ttDepth = bodyDepth = 0
+        inBody = False
+        hasP = False
+        metadataElements = []  # type: List[XmlNode]
+        styles = []  # type: List[XmlNode]
+        regionElements = []  # type: List[XmlNode]
+        sawMetadata = False
+        path = []  # 当前打开的元素
+
+        for event, element in readEvents(data):
+            if event == 'start':
+                path.append(element)
+                depth = len(path)
+                tagName = localName(element.tag)
+                if tagName == 'parsererror':
+                    raise InvalidXML('ttml parsererror')
+                if tt is None:
+                    if tagName == 'tt':
+                        tt = XmlNode(tagName, element.attrib)
+                        ttDepth = depth
+                    continue
+                if depth == ttDepth + 1 and tagName == 'body' and body is None:
+                    # head已经读完了
+                    if head is None:
+                        head = TtmlHead_(tt, metadataElements, styles, regionElements)
+                        if headKey is not None:
+                            self.headCache_ = (headKey, head)
+                    body = XmlNode(tagName, element.attrib, head.tt)
+                    bodyDepth = depth
+                    inBody = True
+                elif inBody and depth == bodyDepth + 1:
+                    if tagName == 'p':
+                        raise InvalidTextCue('<p> can only be inside <div> in TTML')
+                    if tagName == 'div':
+                        div = XmlNode(tagName, element.attrib, body)
+                        hasP = False
+                elif div and depth == bodyDepth + 2:
+                    if tagName == 'span':
+                        raise InvalidTextCue('<span> can only be inside <p> in TTML')
+                    if tagName == 'p':
+                        hasP = True
                 continue
-            if divNode.tagName != 'div':
+
+            depth = len(path)
+            path.pop()
+            if tt is None or depth <= ttDepth:
                 continue
-            has_p = False
-            for pChildren in divNode.childNodes:
-                if isinstance(pChildren, Element) is False:
-                    continue
-                if pChildren.tagName == 'span':
-                    raise InvalidTextCue(
-                        '<span> can only be inside <p> in TTML')
-                if pChildren.tagName == 'p':
-                    has_p = True
-                    cue = TtmlTextParser.parseCue_(pChildren, time.periodStart, rateInfo, metadataElements,
-                                                   styles, regionElements, cueRegions, whitespaceTrim, False, cellResolutionInfo)
-                    if cue:
-                        cues.append(cue)
-            if not has_p:
-                cue = TtmlTextParser.parseCue_(divNode, time.periodStart, rateInfo, metadataElements,
-                                               styles, regionElements, cueRegions, whitespaceTrim, False, cellResolutionInfo)
+            tagName = localName(element.tag)
+            if depth == ttDepth + 1:
+                if inBody:
+                    inBody = False
+                elif tagName != 'body' and head is None:
+                    # head 收集所有的style region和第一个metadata
+                    for node in XmlNode.fromElement(element, tt).iter():
+                        if node.tagName == 'style':
+                            styles.append(node)
+                        elif node.tagName == 'region':
+                            regionElements.append(node)
+                        elif node.tagName == 'metadata' and not sawMetadata:
+                            sawMetadata = True
+                            metadataElements = [
+                                childNode for childNode in node.childNodes if isinstance(childNode, XmlNode)]
+                element.clear()
+                continue
+            if not inBody:
+                continue
+            if depth == bodyDepth + 2 and div and tagName == 'p':
+                cue = TtmlTextParser.parseCue_(XmlNode.fromElement(element, div), div, time.periodStart, head,
+                                               head.whitespaceTrim, False)
                 if cue:
-                    cues.append(cue)
-        return cues
+                    yield cue
+                path[-1].remove(element)
+            elif depth == bodyDepth + 1:
+                if div and not hasP:
+                    div.setChildren(element)
+                    cue = TtmlTextParser.parseCue_(div, body, time.periodStart, head, head.whitespaceTrim, False)
+                    if cue:
+                        yield cue
+                div = None
+                path[-1].remove(element)
+
+        if tt is None:
+            raise InvalidXML('TTML does not contain <tt> tag.')
+
+    @staticmethod
+    def getHeadKey_(data: bytes) -> bytes:
+        '''
+        <body>之前的原始数据 作为head缓存的key
+        里面有注释或者CDATA时不缓存 避免把注释里的<body当成真的
+        '''
+        match = bodyTag_.search(data)
+        if not match:
+            return None
+        headKey = bytes(data[:match.start()])
+        if b'<!--' in headKey or b'<![CDATA[' in headKey:
+            return None
+        return headKey
 
     @staticmethod
-    def parseCue_(cueNode: Union[Node, Element], offset, rateInfo, metadataElements, styles, regionElements, cueRegions, whitespaceTrim, isNested, cellResolution):
-        cueElement = None  # type: Element
-        parentElement = cueNode.parentNode  # type: Element
-
-        if cueNode.nodeType == Node.TEXT_NODE:
-            span = document.createElement('span')  # tpye: Text
-            span.appendChild(cueNode)
-            cueElement = span
+    def parseCue_(cueNode: Union[XmlNode, str], parentElement: XmlNode, offset, head: TtmlHead_, whitespaceTrim, isNested):
+        rateInfo = head.rateInfo
+        cueElement = None  # type: XmlNode
+
+        if isinstance(cueNode, str):
+            # 文本节点包一层span 和js一样这个span是没有父节点的
+            cueElement = XmlNode('span', {}, None, [cueNode])
         else:
-            assert cueNode.nodeType == Node.ELEMENT_NODE, 'nodeType should be ELEMENT_NODE!'
             cueElement = cueNode
         assert cueElement, 'cueElement should be non-None!'
 
         spaceStyle = cueElement.getAttribute(
             'xml:space') or 'default' if whitespaceTrim else 'preserve'
         localWhitespaceTrim = spaceStyle == 'default'
-        if cueElement.firstChild and cueElement.firstChild.nodeValue:
+        firstChild = cueElement.firstChild
+        if isinstance(firstChild, str):
             # hasTextContent = re.match('\S', cueElement.firstChild.nodeValue)
             # \S 不匹配换行 但是js的test却会返回true
             # 所以python这里会误判 那么strip下达到修复效果
             hasTextContent = re.match(
-                '\S', cueElement.firstChild.nodeValue.strip())
+                '\S', firstChild.strip())
         else:
             hasTextContent = False
         hasTimeAttributes = cueElement.hasAttribute(
@@ -165,7 +347,7 @@ class TtmlTextParser:
             elif localWhitespaceTrim:
                 return None
         start, end = TtmlTextParser.parseTime_(cueElement, rateInfo)
-        while parentElement and parentElement.nodeType == Node.ELEMENT_NODE and parentElement.tagName != 'tt':
+        while parentElement and parentElement.tagName != 'tt':
             start, end = TtmlTextParser.resolveTime_(
                 parentElement, rateInfo, start, end)
             parentElement = parentElement.parentNode
@@ -184,47 +366,40 @@ class TtmlTextParser:
         nestedCues = []
         flag = True
         for childNode in cueElement.childNodes:
-            if childNode.nodeType != Node.TEXT_NODE:
+            if not isinstance(childNode, str):
                 flag = False
                 break
         if flag:
-            payload: str = cueElement.firstChild.nodeValue
+            # 文本已经合并成一个节点 没有子节点时是空字符串
+            payload: str = firstChild or ''
             if localWhitespaceTrim:
                 payload = payload.strip()
                 payload = re.sub('\s+', ' ', payload)
         else:
-            for childNode in [_ for _ in cueElement.childNodes]:
+            for childNode in cueElement.childNodes:
                 nestedCue = TtmlTextParser.parseCue_(
                     childNode,
+                    cueElement,
                     offset,
-                    rateInfo,
-                    metadataElements,
-                    styles,
-                    regionElements,
-                    cueRegions,
+                    head,
                     localWhitespaceTrim,
                     True,
-                    cellResolution,
                 )
                 if nestedCue:
                     nestedCues.append(nestedCue)
         cue = Cue(start, end, payload)
         cue.nestedCues = nestedCues
 
-        if cellResolution:
-            cue.cellResolution = cellResolution
+        if head.cellResolutionInfo:
+            cue.cellResolution = head.cellResolutionInfo
 
-        regionElements = TtmlTextParser.getElementsFromCollection_(
-            cueElement, 'region', regionElements, '')
-        regionElement = None
-        if len(regionElements) > 0 and regionElements[0].getAttribute('xml:id'):
-            regionElement = regionElements[0]
-            regionId = regionElement.getAttribute('xml:id')
-            cue.region = [_ for _ in cueRegions if _.id == regionId][0]
+        regionElement, cueRegion = head.resolver.getRegion(cueElement)
+        if cueRegion:
+            cue.region = cueRegion
         imageElement = None
         for nameSpace in smpteNsList_:
             imageElements = TtmlTextParser.getElementsFromCollection_(
-                cueElement, 'backgroundImage', metadataElements, '#', nameSpace)
+                cueElement, 'backgroundImage', head.metadataElements, '#', nameSpace)
             if len(imageElements) > 0:
                 imageElement = imageElements[0]
                 break
@@ -236,7 +411,7 @@ class TtmlTextParser:
             cueElement,
             regionElement,
             imageElement,
-            styles,
+            head.resolver,
             isNested,
             isLeaf
         )
@@ -268,7 +443,7 @@ class TtmlTextParser:
         return start, end
 
     @staticmethod
-    def parseTime_(element: Element, rateInfo: RateInfo_):
+    def parseTime_(element: XmlNode, rateInfo: RateInfo_):
         start = TtmlTextParser.parseTimeAttribute_(
             element.getAttribute('begin'), rateInfo)
         end = TtmlTextParser.parseTimeAttribute_(
@@ -354,16 +529,15 @@ class TtmlTextParser:
         return ret
 
     @staticmethod
-    def addStyle_(cue, cueElement, region, imageElement: Element, styles: List[Element], isNested: bool, isLeaf: bool):
+    def addStyle_(cue, cueElement, region, imageElement: XmlNode, resolver: StyleResolver_, isNested: bool, isLeaf: bool):
         shouldInheritRegionStyles = isNested or isLeaf
+        style = resolver.getStyle(cueElement, region, shouldInheritRegionStyles)
 
-        _direction = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'direction', shouldInheritRegionStyles)
+        _direction = style['direction']
         if _direction == 'rtl':
             cue.direction = direction.HORIZONTAL_RIGHT_TO_LEFT
 
-        _writingMode = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'writingMode', shouldInheritRegionStyles)
+        _writingMode = style['writingMode']
         if _writingMode == 'tb' or _writingMode == 'tblr':
             cue.writingMode = writingMode.VERTICAL_LEFT_TO_RIGHT
         elif _writingMode == 'tbrl':
@@ -373,8 +547,7 @@ class TtmlTextParser:
         elif _writingMode:
             cue.direction = direction.HORIZONTAL_LEFT_TO_RIGHT
 
-        align = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'textAlign', shouldInheritRegionStyles)
+        align = style['textAlign']
         if align:
             cue.positionAlign = textAlignToPositionAlign_[align]
             cue.lineAlign = textAlignToLineAlign_[align]
@@ -384,52 +557,43 @@ class TtmlTextParser:
         else:
             cue.textAlign = textAlign.START
 
-        _displayAlign = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'displayAlign', shouldInheritRegionStyles)
+        _displayAlign = style['displayAlign']
         if _displayAlign:
             assert displayAlign.__members__.get(_displayAlign.upper(
             )), f'{_displayAlign.upper()} Should be in Cue.displayAlign values!'
             cue.displayAlign = displayAlign[_displayAlign.upper()]
 
-        color = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'color', shouldInheritRegionStyles)
+        color = style['color']
         if color:
             cue.color = color
 
-        backgroundColor = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'backgroundColor', shouldInheritRegionStyles)
+        backgroundColor = style['backgroundColor']
         if backgroundColor:
             cue.backgroundColor = backgroundColor
 
-        border = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'border', shouldInheritRegionStyles)
+        border = style['border']
         if border:
             cue.border = border
 
-        fontFamily = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'fontFamily', shouldInheritRegionStyles)
+        fontFamily = style['fontFamily']
         if fontFamily:
             cue.fontFamily = fontFamily
 
-        fontWeight = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'fontWeight', shouldInheritRegionStyles)
-        if fontWeight and fontWeight == 'bold':
+        _fontWeight = style['fontWeight']
+        if _fontWeight and _fontWeight == 'bold':
             cue.fontWeight = fontWeight.BOLD
 
-        wrapOption = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'wrapOption', shouldInheritRegionStyles)
+        wrapOption = style['wrapOption']
         if wrapOption and wrapOption == 'noWrap':
             cue.wrapLine = False
         else:
             cue.wrapLine = True
 
-        lineHeight = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'lineHeight', shouldInheritRegionStyles)
+        lineHeight = style['lineHeight']
         if lineHeight and unitValues_.match(lineHeight):
             cue.lineHeight = lineHeight
 
-        fontSize = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'fontSize', shouldInheritRegionStyles)
+        fontSize = style['fontSize']
 
         if fontSize:
             isValidFontSizeUnit = unitValues_.match(
@@ -437,8 +601,7 @@ class TtmlTextParser:
             if isValidFontSizeUnit:
                 cue.fontSize = fontSize
 
-        _fontStyle = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'fontStyle', shouldInheritRegionStyles)
+        _fontStyle = style['fontStyle']
         if _fontStyle:
             assert fontStyle.__members__.get(
                 _fontStyle.upper()), f'{_fontStyle.upper()} Should be in Cue.fontStyle values!'
@@ -448,32 +611,29 @@ class TtmlTextParser:
             backgroundImageType = imageElement.getAttribute(
                 'imageType') or imageElement.getAttribute('imagetype')
             backgroundImageEncoding = imageElement.getAttribute('encoding')
-            backgroundImageData = imageElement.textContent.trim()
+            backgroundImageData = imageElement.textContent.strip()
             if backgroundImageType == 'PNG' and backgroundImageEncoding == 'Base64' and backgroundImageData:
                 cue.backgroundImage = 'data:image/pngbase64,' + backgroundImageData
 
-        letterSpacing = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'letterSpacing', shouldInheritRegionStyles)
+        letterSpacing = style['letterSpacing']
         if letterSpacing and unitValues_.match(letterSpacing):
             cue.letterSpacing = letterSpacing
 
-        linePadding = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'linePadding', shouldInheritRegionStyles)
+        linePadding = style['linePadding']
         if linePadding and unitValues_.match(linePadding):
             cue.linePadding = linePadding
 
-        opacity = TtmlTextParser.getStyleAttribute_(
-            cueElement, region, styles, 'opacity', shouldInheritRegionStyles)
+        opacity = style['opacity']
         if opacity:
             cue.opacity = float(opacity)
 
-        textDecorationRegion = TtmlTextParser.getStyleAttributeFromRegion_(
-            region, styles, 'textDecoration')
+        textDecorationRegion = resolver.getStyleAttributeFromRegion(
+            region, 'textDecoration')
         if textDecorationRegion:
             TtmlTextParser.addTextDecoration_(cue, textDecorationRegion)
 
-        textDecorationElement = TtmlTextParser.getStyleAttributeFromElement_(
-            cueElement, styles, 'textDecoration')
+        textDecorationElement = resolver.getStyleAttributeFromElement(
+            cueElement, 'textDecoration')
         if textDecorationElement:
             TtmlTextParser.addTextDecoration_(cue, textDecorationElement)
 
@@ -501,17 +661,7 @@ class TtmlTextParser:
                     _ for _ in cue.textDecoration if textDecoration.OVERLINE != _]
 
     @staticmethod
-    def getStyleAttribute_(cueElement, region, styles, attribute, shouldInheritRegionStyles=True):
-        attr = TtmlTextParser.getStyleAttributeFromElement_(
-            cueElement, styles, attribute)
-        if attr:
-            return attr
-        if shouldInheritRegionStyles:
-            return TtmlTextParser.getStyleAttributeFromRegion_(region, styles, attribute)
-        return None
-
-    @staticmethod
-    def parseCueRegion_(regionElement: Element, styles: List[Element], globalExtent: str):
+    def parseCueRegion_(regionElement: XmlNode, styles: List[XmlNode], globalExtent: str):
         region = CueRegion()
         _id = regionElement.getAttribute('xml:id')
         if not _id:
@@ -574,12 +724,12 @@ class TtmlTextParser:
         return region
 
     @staticmethod
-    def getInheritedStyleAttribute_(element: Element, styles, attribute):
+    def getInheritedStyleAttribute_(element: XmlNode, styles, attribute):
         ttsNs = styleNs_
         ebuttsNs = styleEbuttsNs_
 
         inheritedStyles = TtmlTextParser.getElementsFromCollection_(
-            element, 'style', styles, '')  # tpye: List[Element]
+            element, 'style', styles, '')  # tpye: List[XmlNode]
 
         styleValue = None
         # The last value in our styles stack takes the precedence over the others
@@ -605,7 +755,7 @@ class TtmlTextParser:
         return styleValue
 
     @staticmethod
-    def getStyleAttributeFromElement_(cueElement: Element, styles, attribute: str):
+    def getStyleAttributeFromElement_(cueElement: XmlNode, styles, attribute: str):
         ttsNs = styleNs_
         elementAttribute = cueElement.getAttributeNS(ttsNs, attribute)
         if elementAttribute:
@@ -613,7 +763,7 @@ class TtmlTextParser:
         return TtmlTextParser.getInheritedStyleAttribute_(cueElement, styles, attribute)
 
     @staticmethod
-    def getInheritedAttribute_(element: Element, attributeName: str, nsName: str):
+    def getInheritedAttribute_(element: XmlNode, attributeName: str, nsName: str):
         ret = None
         while element:
             if nsName:
@@ -623,14 +773,14 @@ class TtmlTextParser:
             if ret:
                 break
             parentNode = element.parentNode
-            if isinstance(parentNode, Element):
+            if isinstance(parentNode, XmlNode):
                 element = parentNode
             else:
                 break
         return ret
 
     @staticmethod
-    def getElementsFromCollection_(element: Element, attributeName: str, collection: list, prefixName: str, nsName: str = None):
+    def getElementsFromCollection_(element: XmlNode, attributeName: str, collection: list, prefixName: str, nsName: str = None):
         items = []
         if not element or len(collection) < 1:
             return items
@@ -647,7 +797,7 @@ class TtmlTextParser:
         return items
 
     @staticmethod
-    def getStyleAttributeFromRegion_(region: Element, styles, attribute):
+    def getStyleAttributeFromRegion_(region: XmlNode, styles, attribute):
         ttsNs = styleNs_
         if not region:
             return None
@@ -724,3 +874,27 @@ smpteNsList_ = [
     'http://www.smpte-ra.org/schemas/2052-1/2010/smpte-tt',
     'http://www.smpte-ra.org/schemas/2052-1/2013/smpte-tt',
 ]
+
+# addStyle_用到的样式属性 StyleResolver_一次解析出全部
+styleAttributes_ = (
+    'direction',
+    'writingMode',
+    'textAlign',
+    'displayAlign',
+    'color',
+    'backgroundColor',
+    'border',
+    'fontFamily',
+    'fontWeight',
+    'wrapOption',
+    'lineHeight',
+    'fontSize',
+    'fontStyle',
+    'letterSpacing',
+    'linePadding',
+    'opacity',
+)
+styleAttributeNames_ = tuple((attribute, f'{{{styleNs_}}}{attribute}') for attribute in styleAttributes_)
+
+# <body 或者 <tt:body
+bodyTag_ = re.compile(rb'<(?:[\w.-]+:)?body[\s/>]')
@@ -1,9 +1,11 @@
 import re
-from typing import Dict, List, Union
-from xml.dom.minidom import parseString, Node, Element, Text
+from html import unescape
+from typing import Dict, List
 
 from tools.pyshaka.text.Cue import Cue, defaultTextColor, fontStyle, fontWeight, textDecoration
-from tools.pyshaka.log import log
+
+# <c.yellow> <v.loud Bob> </c> 时间戳<00:01.000>也会匹配到 之后忽略
+cueTag_ = re.compile(r'<(/?)([^\s<>/.][^\s<>/]*)[^<>]*?(/?)>')
 
 
 class VttTextParser:
@@ -19,103 +21,88 @@ class VttTextParser:
 
     @staticmethod
     def parseCueStyles(payload: str, rootCue: Cue, styles: Dict[str, Cue]):
+        '''
+        用简单的标签切分代替每个cue都用minidom解析一次
+        不要求标签严格闭合 </c> 可以结束 <c.yellow>
+        '''
         if len(styles) == 0:
             VttTextParser.addDefaultTextColor_(styles)
-        payload = VttTextParser.replaceColorPayload_(payload)
-        xmlPayload = '<span>' + payload + '</span>'
-        elements = parseString(xmlPayload).getElementsByTagName(
-            'span')  # type: List[Element]
-        if len(elements) > 0 and elements[0]:
-            element = elements[0]
-            cues = []  # type: List[Cue]
-            childNodes = element.childNodes  # type: List[Element]
-            if len(childNodes) == 1:
-                childNode = childNodes[0]
-                if childNode.nodeType == Node.TEXT_NODE or childNode.nodeType == Node.CDATA_SECTION_NODE:
-                    rootCue.payload = payload
-                    return
-            for childNode in childNodes:
-                VttTextParser.generateCueFromElement_(
-                    childNode, rootCue, cues, styles)
-            rootCue.nestedCues = cues
-        else:
-            log.warning(f'The cue\'s markup could not be parsed: {payload}')
+        if '<' not in payload or not cueTag_.search(payload):
+            # 纯文本 原样作为payload
             rootCue.payload = payload
+            return
+        cues = []  # type: List[Cue]
+        # 打开的标签 (标签名, 对应的cue)
+        stack = [('', rootCue)]
+        position = 0
+        for match in cueTag_.finditer(payload):
+            if match.start() > position:
+                VttTextParser.generateCueFromText_(payload[position:match.start()], stack[-1][1], cues)
+            position = match.end()
+            isEnd, name, isEmpty = match.groups()
+            tag = name.split('.', 1)[0]
+            if tag[0].isdigit() or isEmpty:
+                # 时间戳或者空标签 不影响样式
+                continue
+            if isEnd:
+                for index in range(len(stack) - 1, 0, -1):
+                    if stack[index][0] == tag:
+                        del stack[index:]
+                        break
+                continue
+            stack.append((tag, VttTextParser.generateCueFromTag_(name, stack[-1][1], styles)))
+        if position < len(payload):
+            VttTextParser.generateCueFromText_(payload[position:], stack[-1][1], cues)
+        rootCue.nestedCues = cues
 
     @staticmethod
-    def generateCueFromElement_(element: Union[Element, Text], rootCue: Cue, cues: List[Cue], styles: Dict[str, Cue]):
+    def generateCueFromTag_(name: str, rootCue: Cue, styles: Dict[str, Cue]) -> Cue:
         nestedCue = rootCue.clone()
-        if element.nodeType == Node.ELEMENT_NODE and element.nodeName:
-            bold = fontWeight.BOLD
-            italic = fontStyle.ITALIC
-            underline = textDecoration.UNDERLINE
-            tags = re.split('[ .]+', element.nodeName)
-            for tag in tags:
-                if styles.get(tag):
-                    VttTextParser.mergeStyle_(nestedCue, styles.get(tag))
-                if tag == 'b':
-                    nestedCue.fontWeight = bold
-                elif tag == 'i':
-                    nestedCue.fontStyle = italic
-                elif tag == 'u':
-                    nestedCue.textDecoration.append(underline)
-        isTextNode = element.nodeType == Node.TEXT_NODE or element.nodeType == Node.CDATA_SECTION_NODE
-        if isTextNode:
-            # element 这里是 Text 类型 js的textContent对应这里的data
-            textArr = element.data.split('\n')
-            isFirst = True
-            for text in textArr:
-                if not isFirst:
-                    lineBreakCue = rootCue.clone()
-                    lineBreakCue.lineBreak = True
-                    cues.append(lineBreakCue)
-                if len(text) > 0:
-                    textCue = nestedCue.clone()
-                    textCue.payload = text
-                    cues.append(textCue)
-                isFirst = False
-        else:
-            for childNode in element.childNodes:
-                VttTextParser.generateCueFromElement_(
-                    childNode, nestedCue, cues, styles)
+        bold = fontWeight.BOLD
+        italic = fontStyle.ITALIC
+        underline = textDecoration.UNDERLINE
+        for tag in re.split('[ .]+', name):
+            if styles.get(tag):
+                VttTextParser.mergeStyle_(nestedCue, styles.get(tag))
+            if tag == 'b':
+                nestedCue.fontWeight = bold
+            elif tag == 'i':
+                nestedCue.fontStyle = italic
+            elif tag == 'u':
+                nestedCue.textDecoration.append(underline)
+        return nestedCue
 
     @staticmethod
-    def replaceColorPayload_(payload: str):
+    def generateCueFromText_(text: str, rootCue: Cue, cues: List[Cue]):
+        if '&' in text:
+            text = unescape(text)
+        isFirst = True
+        for line in text.split('\n'):
+            if not isFirst:
+                lineBreakCue = rootCue.clone()
+                lineBreakCue.lineBreak = True
+                cues.append(lineBreakCue)
+            if len(line) > 0:
+                textCue = rootCue.clone()
+                textCue.payload = line
+                cues.append(textCue)
+            isFirst = False
+
+    @staticmethod
+    def mergeStyle_(cue: Cue, refCue: Cue):
         '''
-        这里没有找到相关样本测试 可能有bug
+        refCue中非空的值覆盖cue
         '''
-        names = []
-        nameStart = -1
-        newPayload = ''
-        for i in range(len(payload)):
-            if payload[i] == '/':
-                if '>' not in payload:
-                    continue
-
-                end = payload.index('>', i)
-                if end <= i:
-                    return payload
-                tagEnd = payload[i + 1:end]
-                tagStart = names.pop(-1)
-                if not tagEnd or not tagStart:
-                    return payload
-                elif tagStart == tagEnd:
-                    newPayload += '/' + tagEnd + '>'
-                    i += len(tagEnd) + 1
-                else:
-                    if not tagStart.startsWith('c.') or tagEnd != 'c':
-                        return payload
-                    newPayload += '/' + tagStart + '>'
-                    i += len(tagEnd) + 1
-            else:
-                if payload[i] == '<':
-                    nameStart = i + 1
-                elif payload[i] == '>':
-                    if nameStart > 0:
-                        names.append(payload[nameStart:i])
-                        nameStart = -1
-                newPayload += payload[i]
-        return newPayload
+        if not refCue:
+            return
+        cue.backgroundColor = refCue.backgroundColor or cue.backgroundColor
+        cue.color = refCue.color or cue.color
+        cue.fontFamily = refCue.fontFamily or cue.fontFamily
+        cue.fontSize = refCue.fontSize or cue.fontSize
+        cue.fontWeight = refCue.fontWeight
+        cue.fontStyle = refCue.fontStyle
+        cue.opacity = refCue.opacity
+        cue.wrapLine = refCue.wrapLine
 
     @staticmethod
     def addDefaultTextColor_(styles: Dict[str, Cue]):
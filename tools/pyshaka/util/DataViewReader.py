@@ -5,6 +5,15 @@ from tools.pyshaka.util.exceptions import OutOfBoundsError
 from tools.pyshaka.util.exceptions import IntOverflowError
 
 
+# 预编译的Struct 配合unpack_from直接从memoryview读取 不再切片复制
+UINT32_BE = struct.Struct('>I')
+UINT32_LE = struct.Struct('<I')
+INT32_BE = struct.Struct('>i')
+INT32_LE = struct.Struct('<i')
+UINT32X2_BE = struct.Struct('>II')
+UINT32X2_LE = struct.Struct('<II')
+
+
 class Endianness(Enum):
     BIG_ENDIAN = 0
     LITTLE_ENDIAN = 1
@@ -15,11 +24,23 @@ class DataView:
     shaka/util/buffer_utils.js
     '''
 
-    def __init__(self, data: bytes):
-        self.buffer = memoryview(bytearray(data))
-        # self.buffer = memoryview(bytearray([0x96, 0x87, 0xac]))
+    def __init__(self, data: bytes, offset: int = 0, length: int = None):
+        # 不复制数据 直接在原buffer上建立视图 offset/length用于嵌套box共享同一块内存
+        buffer = data if isinstance(data, memoryview) else memoryview(data)
+        if offset or length is not None:
+            end = len(buffer) if length is None else offset + length
+            buffer = buffer[offset:end]
+        self.buffer = buffer
         self.byteLength = len(self.buffer)  # type: int
 
+    def getPadded_(self, position: int, littleEndian: bool, signed: bool = False):
+        # 越界读取时保持原来的行为 长度不足4位在前面补0
+        buf = self.buffer[position:position + 4].tobytes()
+        buf = b'\x00' * (4 - len(buf)) + buf
+        if signed:
+            return (INT32_LE if littleEndian else INT32_BE).unpack(buf)[0]
+        return (UINT32_LE if littleEndian else UINT32_BE).unpack(buf)[0]
+
     def getUint8(self):
         pass
 
@@ -27,14 +48,11 @@ class DataView:
         pass
 
     def getUint32(self, position: int, littleEndian: bool = False):
-        # 这里记得切片长度要补齐4位 不然unpack会报错
-        buf = self.buffer[position:position + 4].tobytes()
-        if len(buf) < 4:
-            buf = b'\x00' * (4 - len(buf)) + buf
+        if position + 4 > self.byteLength:
+            return self.getPadded_(position, littleEndian)
         if littleEndian:
-            return struct.unpack("<I", buf)[0]
-        else:
-            return struct.unpack(">I", buf)[0]
+            return UINT32_LE.unpack_from(self.buffer, position)[0]
+        return UINT32_BE.unpack_from(self.buffer, position)[0]
 
     def getUint64(self, position: int, littleEndian: bool = False):
         # 这里记得切片长度要补齐4位 不然
@@ -53,13 +71,11 @@ class DataView:
         pass
 
     def getInt32(self, position: int, littleEndian: bool = False):
-        buf = self.buffer[position:position + 4].tobytes()
-        if len(buf) < 4:
-            buf = b'\x00' * (4 - len(buf)) + buf
+        if position + 4 > self.byteLength:
+            return self.getPadded_(position, littleEndian, signed=True)
         if littleEndian:
-            return struct.unpack("<i", buf)[0]
-        else:
-            return struct.unpack(">i", buf)[0]
+            return INT32_LE.unpack_from(self.buffer, position)[0]
+        return INT32_BE.unpack_from(self.buffer, position)[0]
 
     def getInt64(self):
         pass
@@ -99,8 +115,8 @@ class DataViewReader(DataView):
     shaka/util/data_view_reader.js
     '''
 
-    def __init__(self, data: bytes, endianness: Endianness):
-        self.dataView_ = DataView(data)  # type: DataView
+    def __init__(self, data: bytes, endianness: Endianness, offset: int = 0, length: int = None):
+        self.dataView_ = DataView(data, offset, length)  # type: DataView
         self.littleEndian_ = endianness == Endianness.LITTLE_ENDIAN  # type: bool
         self.position_ = 0  # type: int
 
@@ -123,9 +139,14 @@ class DataViewReader(DataView):
         pass
 
     def readUint32(self) -> int:
-        value = self.dataView_.getUint32(self.position_, self.littleEndian_)
-        self.position_ += 4
-        return value
+        position = self.position_
+        dataView = self.dataView_
+        self.position_ = position + 4
+        if position + 4 > dataView.byteLength:
+            return dataView.getPadded_(position, self.littleEndian_)
+        if self.littleEndian_:
+            return UINT32_LE.unpack_from(dataView.buffer, position)[0]
+        return UINT32_BE.unpack_from(dataView.buffer, position)[0]
 
     def readInt32(self):
         value = self.dataView_.getInt32(self.position_, self.littleEndian_)
@@ -133,12 +154,17 @@ class DataViewReader(DataView):
         return value
 
     def readUint64(self) -> int:
-        if self.littleEndian_:
-            low = self.dataView_.getUint32(self.position_, True)
-            high = self.dataView_.getUint32(self.position_ + 4, True)
+        if self.position_ + 8 > self.dataView_.byteLength:
+            if self.littleEndian_:
+                low = self.dataView_.getUint32(self.position_, True)
+                high = self.dataView_.getUint32(self.position_ + 4, True)
+            else:
+                high = self.dataView_.getUint32(self.position_, False)
+                low = self.dataView_.getUint32(self.position_ + 4, False)
+        elif self.littleEndian_:
+            low, high = UINT32X2_LE.unpack_from(self.dataView_.buffer, self.position_)
         else:
-            high = self.dataView_.getUint32(self.position_, False)
-            low = self.dataView_.getUint32(self.position_ + 4, False)
+            high, low = UINT32X2_BE.unpack_from(self.dataView_.buffer, self.position_)
 
         if high > 0x1FFFFF:
             raise IntOverflowError
@@ -154,6 +180,25 @@ class DataViewReader(DataView):
         self.position_ += length
         return data
 
+    def readView(self, length: int) -> memoryview:
+        # 与readBytes相同 但返回的是原buffer上的视图 不复制
+        assert length >= 0, 'Bad call to DataViewReader.readView'
+        if self.position_ + length > self.dataView_.byteLength:
+            raise OutOfBoundsError
+        data = self.dataView_.buffer[self.position_:self.position_ + length]
+        self.position_ += length
+        return data
+
+    def subReader(self, length: int) -> 'DataViewReader':
+        # 嵌套box的reader 是同一块buffer上的(offset, length)视图
+        assert length >= 0, 'Bad call to DataViewReader.subReader'
+        if self.position_ + length > self.dataView_.byteLength:
+            raise OutOfBoundsError
+        reader = DataViewReader(self.dataView_.buffer, Endianness.LITTLE_ENDIAN if self.littleEndian_ else Endianness.BIG_ENDIAN,
+                                self.position_, length)
+        self.position_ += length
+        return reader
+
     def skip(self, length: int):
         assert length >= 0, 'Bad call to DataViewReader.skip'
         if self.position_ + length > self.dataView_.byteLength:
@@ -1,4 +1,4 @@
-from typing import Dict, Callable
+from typing import Dict, Callable, Tuple
 from enum import Enum
 
 # from tools.pyshaka.log import log
@@ -13,18 +13,25 @@ class ParsedBox:
     于是这里就把ParsedBox放到这里了
     '''
 
-    def __init__(self, **kwargs):
-        self.parser = kwargs['parser']  # type: Mp4Parser
-        self.partialOkay = kwargs['partialOkay']  # type: bool
-        self.start = kwargs['start']  # type: int
-        self.size = kwargs['size']  # type: int
-        self.version = kwargs['version']  # type: int
-        self.flags = kwargs['flags']  # type: int
-        self.reader = kwargs['reader']  # type: DataViewReader
-        self.has64BitSize = kwargs['has64BitSize']  # type: bool
+    __slots__ = ('parser', 'partialOkay', 'start', 'size', 'version', 'flags', 'reader', 'has64BitSize')
+
+    def __init__(self, parser: 'Mp4Parser', partialOkay: bool, start: int, size: int, version: int, flags: int,
+                 reader: DataViewReader, has64BitSize: bool):
+        self.parser = parser  # type: Mp4Parser
+        self.partialOkay = partialOkay  # type: bool
+        self.start = start  # type: int
+        self.size = size  # type: int
+        self.version = version  # type: int
+        self.flags = flags  # type: int
+        self.reader = reader  # type: DataViewReader
+        self.has64BitSize = has64BitSize  # type: bool
 
 
 class Mp4Parser:
+    '''
+    box()/fullBox()注册一次得到解析计划(plan_) 之后可以对多个分段重复调用parse
+    plan_以整数fourcc为key 值为(是否fullBox, 解析函数)
+    '''
 
     class BoxType_(Enum):
         BASIC_BOX = 0
@@ -33,18 +40,21 @@ class Mp4Parser:
     def __init__(self):
         self.headers_ = {}  # type: Dict[int, Mp4Parser.BoxType_]
         self.boxDefinitions_ = {}  # type: Dict[int, Callable]
+        self.plan_ = {}  # type: Dict[int, Tuple[bool, Callable]]
         self.done_ = False  # type: bool
 
     def box(self, _type: str, definition: Callable) -> 'Mp4Parser':
         typeCode = Mp4Parser.typeFromString_(_type)
         self.headers_[typeCode] = Mp4Parser.BoxType_.BASIC_BOX
         self.boxDefinitions_[typeCode] = definition
+        self.plan_[typeCode] = (False, definition)
         return self
 
     def fullBox(self, _type: str, definition: Callable) -> 'Mp4Parser':
         typeCode = Mp4Parser.typeFromString_(_type)
         self.headers_[typeCode] = Mp4Parser.BoxType_.FULL_BOX
         self.boxDefinitions_[typeCode] = definition
+        self.plan_[typeCode] = (True, definition)
         return self
 
     def stop(self):
@@ -58,35 +68,35 @@ class Mp4Parser:
 
     def parseNext(self, absStart: int, reader: DataViewReader, partialOkay: bool, stopOnPartial: bool = False):
         start = reader.getPosition()
+        length = reader.getLength()
 
         # size(4 bytes) + type(4 bytes) = 8 bytes
-        if stopOnPartial and start + 8 > reader.getLength():
+        if stopOnPartial and start + 8 > length:
             self.done_ = True
             return
 
         size = reader.readUint32()
         _type = reader.readUint32()
-        name = Mp4Parser.typeToString(_type)
         has64BitSize = False
-        # log.info(f'[{name}] Parsing MP4 box')
 
         if size == 0:
-            size = reader.getLength() - start
+            size = length - start
         elif size == 1:
-            if stopOnPartial and reader.getPosition() + 8 > reader.getLength():
+            if stopOnPartial and reader.getPosition() + 8 > length:
                 self.done_ = True
                 return
             size = reader.readUint64()
             has64BitSize = True
-        # 和js不一样 py中不存在key会直接异常 所以这里用get方法
-        boxDefinition = self.boxDefinitions_.get(_type)
+        # 只有注册过的box才会解析 box名字不再转成字符串
+        entry = self.plan_.get(_type)
 
-        if boxDefinition:
+        if entry:
+            isFullBox, boxDefinition = entry
             version = None
             flags = None
 
-            if self.headers_[_type] == Mp4Parser.BoxType_.FULL_BOX:
-                if stopOnPartial and reader.getPosition() + 4 > reader.getLength():
+            if isFullBox:
+                if stopOnPartial and reader.getPosition() + 4 > length:
                     self.done_ = True
                     return
                 versionAndFlags = reader.readUint32()
@@ -94,33 +104,28 @@ class Mp4Parser:
                 flags = versionAndFlags & 0xFFFFFF
 
             end = start + size
-            if partialOkay and end > reader.getLength():
-                end = reader.getLength()
+            if partialOkay and end > length:
+                end = length
 
-            if stopOnPartial and end > reader.getLength():
+            if stopOnPartial and end > length:
                 self.done_ = True
                 return
             payloadSize = end - reader.getPosition()
-            payload = reader.readBytes(payloadSize) if payloadSize > 0 else b''
-
-            payloadReader = DataViewReader(payload, Endianness.BIG_ENDIAN)
-
-            box = {
-                'parser': self,
-                'partialOkay': partialOkay or False,
-                'version': version,
-                'flags': flags,
-                'reader': payloadReader,
-                'size': size,
-                'start': start + absStart,
-                'has64BitSize': has64BitSize,
-            }
-            box = ParsedBox(**box)
-
-            boxDefinition(box)
+            # 不再复制payload 子reader直接引用父reader的buffer
+            payloadReader = reader.subReader(max(payloadSize, 0))
+
+            if boxDefinition is Mp4Parser.children:
+                # 快速路径 moof/traf这类容器box直接解析子box 不创建ParsedBox
+                childStart = start + absStart + 8 + (8 if has64BitSize else 0) + (4 if isFullBox else 0)
+                while payloadReader.hasMoreData() and not self.done_:
+                    self.parseNext(childStart, payloadReader, partialOkay)
+                return
+
+            boxDefinition(ParsedBox(self, partialOkay or False, start + absStart, size,
+                                    version, flags, payloadReader, has64BitSize))
         else:
             skipLength = min(start + size - reader.getPosition(),
-                             reader.getLength() - reader.getPosition())
+                             length - reader.getPosition())
             reader.skip(skipLength)
 
     @staticmethod
@@ -144,7 +149,7 @@ class Mp4Parser:
     def allData(callback: Callable):
         def alldata_callback(box: ParsedBox):
             _all = box.reader.getLength() - box.reader.getPosition()
-            return callback(box.reader.readBytes(_all))
+            return callback(box.reader.readView(_all))
         return alldata_callback
 
     @staticmethod
@@ -0,0 +1,89 @@
+from typing import Dict, List, Union
+from xml.etree.ElementTree import Element, XMLPullParser
+
+xmlNs_ = 'http://www.w3.org/XML/1998/namespace'
+
+# minidom按带前缀的名字取xml:id这类属性 ElementTree里是{namespace}id
+xmlAttributes_ = {
+    'xml:id': f'{{{xmlNs_}}}id',
+    'xml:space': f'{{{xmlNs_}}}space',
+    'xml:lang': f'{{{xmlNs_}}}lang',
+}
+
+# 每次喂给expat的数据量
+chunkSize_ = 64 * 1024
+
+
+def localName(tag: str) -> str:
+    '''
+    {http://www.w3.org/ns/ttml}p -> p
+    '''
+    return tag.rpartition('}')[2]
+
+
+class XmlNode:
+    '''
+    替代minidom的轻量节点 只保留解析字幕需要的部分
+    childNodes里文本节点直接用str表示
+    '''
+
+    __slots__ = ('tagName', 'attributes', 'parentNode', 'childNodes')
+
+    def __init__(self, tagName: str, attributes: Dict[str, str], parentNode: 'XmlNode' = None, childNodes: list = None):
+        self.tagName = tagName  # type: str
+        self.attributes = attributes  # type: Dict[str, str]
+        self.parentNode = parentNode  # type: XmlNode
+        self.childNodes = [] if childNodes is None else childNodes  # type: List[Union[XmlNode, str]]
+
+    @staticmethod
+    def fromElement(element: Element, parentNode: 'XmlNode' = None) -> 'XmlNode':
+        node = XmlNode(localName(element.tag), element.attrib, parentNode)
+        node.setChildren(element)
+        return node
+
+    def setChildren(self, element: Element):
+        '''
+        ElementTree的text/tail转回minidom那样的子节点顺序
+        '''
+        childNodes = self.childNodes = []
+        if element.text:
+            childNodes.append(element.text)
+        for child in element:
+            childNodes.append(XmlNode.fromElement(child, self))
+            if child.tail:
+                childNodes.append(child.tail)
+
+    @property
+    def firstChild(self) -> Union['XmlNode', str]:
+        return self.childNodes[0] if self.childNodes else None
+
+    @property
+    def textContent(self) -> str:
+        return ''.join(child if isinstance(child, str) else child.textContent for child in self.childNodes)
+
+    def getAttribute(self, name: str) -> str:
+        return self.attributes.get(xmlAttributes_.get(name, name), '')
+
+    def getAttributeNS(self, nsName: str, name: str) -> str:
+        return self.attributes.get(f'{{{nsName}}}{name}', '')
+
+    def hasAttribute(self, name: str) -> bool:
+        return xmlAttributes_.get(name, name) in self.attributes
+
+    def iter(self):
+        yield self
+        for child in self.childNodes:
+            if isinstance(child, XmlNode):
+                yield from child.iter()
+
+
+def readEvents(data: bytes, events=('start', 'end')):
+    '''
+    分块喂给expat 边解析边返回事件 不需要先建好整棵树
+    '''
+    parser = XMLPullParser(events=events)
+    for offset in range(0, len(data), chunkSize_):
+        parser.feed(data[offset:offset + chunkSize_])
+        yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
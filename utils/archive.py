@@ -0,0 +1,127 @@
+#!/usr/bin/python3
+# coding: utf-8
+
+"""
+This module is for subtitle archive.
+"""
+from __future__ import annotations
+import logging
+import os
+import time
+import warnings
+import zipfile
+from pathlib import Path
+from configs.config import config
+
+COMPRESSION = {
+    'stored': zipfile.ZIP_STORED,
+    'deflated': zipfile.ZIP_DEFLATED
+}
+
+
+class SubtitleArchive(object):
+    """
+    Zip sink beside the title folder ({title}.WEB-DL.{platform}.zip): files are
+    appended as soon as they are finalized and an existing archive is updated
+    in place, unchanged entries (same size and mtime) are skipped and entries
+    whose file is gone from the title folder are dropped by sync
+    """
+
+    def __init__(self, folder_path, platform='', compression=''):
+        self.folder_path = os.path.normpath(folder_path)
+        zipname = os.path.basename(self.folder_path)
+        self.zipname = f'{zipname}.WEB-DL.{platform}' if platform else f'{zipname}.WEB-DL'
+        self.path = Path(self.folder_path).parent / f'{self.zipname}.zip'
+        if not compression:
+            compression = config.archive.get('compression', 'deflated')
+        self.compression = COMPRESSION.get(compression, zipfile.ZIP_DEFLATED)
+        self.zip_file = None
+        self.entries = {}
+        self.dirty = False
+
+    def __enter__(self) -> SubtitleArchive:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def open(self) -> zipfile.ZipFile:
+        """Open archive for appending, or create it"""
+
+        if not self.zip_file:
+            if zipfile.is_zipfile(self.path):
+                self.zip_file = zipfile.ZipFile(self.path, 'a', self.compression)
+                self.entries = {info.filename: (info.file_size, info.date_time)
+                                for info in self.zip_file.infolist()}
+            else:
+                self.zip_file = zipfile.ZipFile(self.path, 'w', self.compression)
+                self.entries = {}
+        return self.zip_file
+
+    def add(self, file_path) -> bool:
+        """Append file unless the archive already has the same version"""
+
+        arcname = Path(os.path.relpath(file_path, self.folder_path)).as_posix()
+        stat = os.stat(file_path)
+        # zip timestamps have a 2-second resolution
+        date_time = time.localtime(stat.st_mtime)[:6]
+        date_time = date_time[:5] + (date_time[5] // 2 * 2,)
+
+        zip_file = self.open()
+        if arcname in self.entries:
+            if self.entries[arcname] == (stat.st_size, date_time):
+                return False
+            self.dirty = True
+
+        with warnings.catch_warnings():
+            # replaced entries are dropped by compact() on close
+            warnings.simplefilter('ignore', UserWarning)
+            zip_file.write(file_path, arcname)
+        self.entries[arcname] = (stat.st_size, date_time)
+        return True
+
+    def sync(self) -> None:
+        """
+        Add files of the title folder which haven't been archived yet and drop
+        entries of files no longer there (e.g. the folder was re-downloaded)
+        """
+
+        self.open()
+        archived = set()
+        for path, _dirs, files in os.walk(self.folder_path):
+            for file in sorted(files):
+                file_path = os.path.join(path, file)
+                self.add(file_path)
+                archived.add(Path(os.path.relpath(file_path, self.folder_path)).as_posix())
+
+        for arcname in set(self.entries) - archived:
+            del self.entries[arcname]
+            self.dirty = True
+
+    def close(self) -> None:
+        """Close archive, rewrite it once if entries were replaced or dropped"""
+
+        if not self.zip_file:
+            return
+        self.zip_file.close()
+        self.zip_file = None
+
+        if self.dirty:
+            self.compact()
+            self.dirty = False
+
+    def compact(self) -> None:
+        """Keep only the latest entry of each file still in entries"""
+
+        tmp_path = self.path.with_suffix('.tmp')
+        with zipfile.ZipFile(self.path) as src, zipfile.ZipFile(tmp_path, 'w', self.compression) as dst:
+            latest = {info.filename: info for info in src.infolist()}
+            for name, info in latest.items():
+                if name in self.entries:
+                    dst.writestr(info, src.read(info))
+        os.replace(tmp_path, self.path)
+        logger.debug("Compact archive: %s", self.path)
+
+
+if __name__:
+    logger = logging.getLogger(__name__)
@@ -0,0 +1,208 @@
+#!/usr/bin/python3
+# coding: utf-8
+
+"""
+This module is for persistent http response cache.
+"""
+from __future__ import annotations
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+import orjson
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+class ResponseCache(object):
+    """
+    Disk-backed response store: one metadata .json and one .body per entry,
+    least recently used entries are evicted once max_size bytes is exceeded
+    """
+
+    def __init__(self, directory, max_size=256 * 1024 * 1024):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.size = None
+        self.lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def get_key(self, request: requests.PreparedRequest) -> str:
+        """Cache key of method, url, authorization and cookies"""
+
+        key = (f"{request.method} {request.url} {request.headers.get('Authorization', '')} "
+               f"{request.headers.get('Cookie', '')}")
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def load(self, key: str) -> Optional[dict]:
+        """Load entry and mark it as recently used"""
+
+        meta_path = self.directory / f'{key}.json'
+        body_path = self.directory / f'{key}.body'
+        try:
+            entry = orjson.loads(meta_path.read_bytes())
+            entry['body'] = body_path.read_bytes()
+        except (OSError, orjson.JSONDecodeError):
+            return None
+
+        now = time.time()
+        os.utime(meta_path, (now, now))
+        return entry
+
+    def save(self, key: str, response: requests.Response) -> None:
+        """Store response"""
+
+        entry = {
+            'url': response.url,
+            'status': response.status_code,
+            'reason': response.reason,
+            'headers': dict(response.headers),
+            'stored_at': time.time()
+        }
+        meta = orjson.dumps(entry)
+        size = len(response.content) + len(meta) - self.entry_size(key)
+        self.write(self.directory / f'{key}.body', response.content)
+        self.write(self.directory / f'{key}.json', meta)
+
+        with self.lock:
+            if self.size is None:
+                self.size = self.scan()[1]
+            else:
+                self.size += size
+            if self.size > self.max_size:
+                self.evict()
+
+    def touch(self, key: str, entry: dict) -> None:
+        """Renew entry after a 304 revalidation"""
+
+        entry = {k: v for k, v in entry.items() if k != 'body'}
+        entry['stored_at'] = time.time()
+        self.write(self.directory / f'{key}.json', orjson.dumps(entry))
+
+    def entry_size(self, key: str) -> int:
+        """Size of the entry a save is about to replace"""
+
+        size = 0
+        for suffix in ('.json', '.body'):
+            try:
+                size += (self.directory / f'{key}{suffix}').stat().st_size
+            except OSError:
+                pass
+        return size
+
+    def write(self, path: Path, data: bytes) -> None:
+        """Atomic write"""
+
+        with tempfile.NamedTemporaryFile(dir=self.directory, prefix=path.name,
+                                         suffix='.tmp', delete=False) as file:
+            file.write(data)
+        os.replace(file.name, path)
+
+    def scan(self) -> tuple:
+        """Entries as (mtime, size, meta_path) and their total size"""
+
+        entries = []
+        total = 0
+        for meta_path in self.directory.glob('*.json'):
+            body_path = meta_path.with_suffix('.body')
+            try:
+                size = meta_path.stat().st_size + body_path.stat().st_size
+                entries.append((meta_path.stat().st_mtime, size, meta_path))
+            except OSError:
+                continue
+            total += size
+        return entries, total
+
+    def evict(self) -> None:
+        """
+        Remove least recently used entries until the cache fits max_size,
+        called under lock once the tracked size passes it
+        """
+
+        entries, total = self.scan()
+        for _, size, meta_path in sorted(entries):
+            if total <= self.max_size:
+                break
+            for path in (meta_path, meta_path.with_suffix('.body')):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            total -= size
+        self.size = total
+
+
+def cached_response(request: requests.PreparedRequest, entry: dict) -> requests.Response:
+    """Build response from cache entry"""
+
+    response = requests.Response()
+    response.status_code = entry['status']
+    response.reason = entry.get('reason', '')
+    response.headers = CaseInsensitiveDict(entry['headers'])
+    response.encoding = get_encoding_from_headers(response.headers)
+    response.url = entry['url']
+    response.request = request
+    response._content = entry['body']
+    response._content_consumed = True
+    response.raw = io.BytesIO(entry['body'])
+    response.from_cache = True
+    return response
+
+
+class CacheAdapter(requests.adapters.HTTPAdapter):
+    """
+    Serve GET responses from ResponseCache within ttl seconds, afterwards
+    revalidate with ETag/Last-Modified
+    """
+
+    def __init__(self, cache: ResponseCache, ttl=0, include=None, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.cache = cache
+        self.ttl = ttl
+        self.include = include or []
+
+    def is_cacheable(self, request, stream):
+        if request.method != 'GET' or stream:
+            return False
+        if self.include:
+            return any(pattern in request.url for pattern in self.include)
+        return True
+
+    def send(self, request, stream=False, **kwargs):
+        if not self.is_cacheable(request, stream):
+            return super().send(request, stream=stream, **kwargs)
+
+        key = self.cache.get_key(request)
+        entry = self.cache.load(key)
+        if entry and time.time() - entry['stored_at'] < self.ttl:
+            logger.debug("Cache hit: %s", request.url)
+            return cached_response(request, entry)
+
+        if entry:
+            headers = CaseInsensitiveDict(entry['headers'])
+            if headers.get('ETag'):
+                request.headers['If-None-Match'] = headers['ETag']
+            if headers.get('Last-Modified'):
+                request.headers['If-Modified-Since'] = headers['Last-Modified']
+
+        response = super().send(request, stream=stream, **kwargs)
+
+        if entry and response.status_code == 304:
+            logger.debug("Cache revalidated: %s", request.url)
+            self.cache.touch(key, entry)
+            return cached_response(request, entry)
+
+        if response.status_code == 200 and 'no-store' not in response.headers.get('Cache-Control', ''):
+            self.cache.save(key, response)
+        response.from_cache = False
+        return response
+
+
+if __name__:
+    logger = logging.getLogger(__name__)
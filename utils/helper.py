@@ -6,6 +6,8 @@ This module is for common tool.
 """
 import os
 import locale
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 import logging
 import gettext
 import re
@@ -151,5 +153,26 @@ def check_url_exist(url, headers=None):
     return False
 
 
+# spawned workers re-import the app, below this many tasks running inline is faster
+MIN_POOL_TASKS = 8
+
+
+def get_pool_workers(tasks: int) -> int:
+    """Process pool size: one worker per CPU, 1 (inline) for a few tasks"""
+
+    if tasks < MIN_POOL_TASKS:
+        return 1
+    return min(tasks, os.cpu_count() or 1)
+
+
+def process_pool(max_workers) -> ProcessPoolExecutor:
+    """
+    Process pool that spawns fresh interpreters: forking while batch jobs'
+    threads hold logging/tqdm/connection pool locks can deadlock the child
+    """
+    return ProcessPoolExecutor(max_workers=max_workers,
+                               mp_context=multiprocessing.get_context('spawn'))
+
+
 if __name__:
     logger = logging.getLogger(__name__)
@@ -6,21 +6,26 @@ This module is for I/O.
 """
 
 from __future__ import annotations
+import asyncio
+import hashlib
 import logging
-import multiprocessing
 import os
 import re
 import sys
+from itertools import repeat
 from operator import itemgetter
 from pathlib import Path
 from typing import Union
 from urllib.parse import quote
 
 from tqdm import tqdm
+import aiohttp
+import pysubs2
 import requests
 import rtoml
-from configs.config import user_agent, credentials
-from utils.helper import check_url_exist, get_locale
+from configs.config import config, user_agent, credentials
+from utils.helper import get_locale, get_pool_workers, process_pool
+from utils.subtitle import convert_subtitle_data
 
 
 def load_toml(path: Union[Path, str]) -> dict:
@@ -82,40 +87,42 @@ def get_tmdb_info(title: str, release_year: str = "", is_movie: bool = False) ->
         sys.exit(1)
 
 
-def download_file(url, output_path, headers=None):
-    """Download file from url and show progress"""
+CHUNK_SIZE = 64 * 1024
+BUFFER_LIMIT = 8 * 1024 * 1024
+PROGRESS_INTERVAL = 0.5
 
-    if check_url_exist(url):
 
-        if not headers:
-            headers = {'User-Agent': user_agent}
+def file_progress_bar(output_path, total):
+    """Per-file byte progress bar with throttled redraws"""
 
-        res = requests.get(url, headers=headers, stream=True, timeout=10)
-        total = int(res.headers.get('content-length', 0))
-        with open(output_path, 'wb') as file, tqdm(
-            desc=os.path.basename(output_path),
-            total=total,
-            unit='B',
-            unit_scale=True,
-            unit_divisor=1024
-        ) as progress_bar:
-            for data in res.iter_content(chunk_size=1024):
-                size = file.write(data)
-                progress_bar.update(size)
+    return tqdm(
+        desc=os.path.basename(output_path),
+        total=total,
+        unit='B',
+        unit_scale=True,
+        unit_divisor=1024,
+        mininterval=PROGRESS_INTERVAL
+    )
 
-    else:
-        logger.warning(_("\nFile not found!"))
 
+def download_result(url, output_path, status=None, size=0, digest=''):
+    """Per-file download result: status is None when the connection failed"""
 
-def download_files(files, headers=None):
-    """Multi-processing download files"""
+    return {
+        'url': url,
+        'path': output_path,
+        'status': status,
+        'ok': status is not None and status < 400,
+        'size': size,
+        'hash': digest
+    }
 
-    cpus = multiprocessing.cpu_count()
-    max_pool_size = 8
-    pool = multiprocessing.Pool(
-        cpus if cpus < max_pool_size else max_pool_size)
+
+def get_output_paths(files):
+    """Map each downloadable file to its output path (segments are numbered per path)"""
 
     lang_paths = []
+    outputs = []
     for file in sorted(files, key=itemgetter('name')):
         if 'url' in file and 'name' in file and 'path' in file:
             if 'segment' in file and file['segment']:
@@ -130,10 +137,177 @@ def download_files(files, headers=None):
                 lang_paths.append(file['path'])
             else:
                 filename = os.path.join(file['path'], file['name'])
-            pool.apply_async(download_file, args=(
-                file['url'], filename, headers))
-    pool.close()
-    pool.join()
+            outputs.append((file['url'], filename, bool(file.get('segment'))))
+    return outputs
+
+
+async def async_download_file(session, semaphore, url, output_path, progress_bar=None, subtitle_format=''):
+    """
+    Download file from url through a shared keep-alive session; when an
+    aggregate progress bar is given it is advanced once per finished file.
+    With subtitle_format, a .vtt body is kept in the result as 'data' for
+    convert_downloads instead of being written.
+    """
+
+    async with semaphore:
+        try:
+            async with session.get(url) as res:
+                if res.status >= 400:
+                    logger.warning(_("\nFile not found!"))
+                    logger.debug("%s %s", res.status, url)
+                    return download_result(url, output_path, res.status)
+
+                if subtitle_format and Path(output_path).suffix.lower() == '.vtt':
+                    data = await res.read()
+                    result = download_result(
+                        url, output_path, res.status, len(data), hashlib.sha1(data).hexdigest())
+                    result['data'] = data
+                    return result
+
+                total = int(res.headers.get('content-length', 0))
+                checksum = hashlib.sha1()
+                size = 0
+                with open(output_path, 'wb') as file:
+                    if 0 < total <= BUFFER_LIMIT:
+                        data = await read_body(res, total)
+                        size = file.write(data)
+                        checksum.update(data)
+                    elif progress_bar:
+                        async for data in res.content.iter_chunked(CHUNK_SIZE):
+                            size += file.write(data)
+                            checksum.update(data)
+                    else:
+                        with file_progress_bar(output_path, total) as file_bar:
+                            async for data in res.content.iter_chunked(CHUNK_SIZE):
+                                file_bar.update(file.write(data))
+                                checksum.update(data)
+                            size = file_bar.n
+                return download_result(url, output_path, res.status, size, checksum.hexdigest())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as error:
+            logger.error(
+                "Failure - Unable to establish connection: %s.", error)
+            return download_result(url, output_path)
+        finally:
+            if progress_bar:
+                progress_bar.update(1)
+
+
+async def read_body(res, total):
+    """Read a body of known Content-Length into one preallocated buffer"""
+
+    buffer = bytearray(total)
+    size = 0
+    async for data in res.content.iter_chunked(CHUNK_SIZE):
+        end = size + len(data)
+        # same-length slices are copied in place, a longer (decoded) body grows it
+        buffer[size:end] = data
+        size = end
+    del buffer[size:]
+    return buffer
+
+
+def save_converted(data, output_path, subtitle_format):
+    """
+    Convert subtitle in memory, keep the raw file for convert_subtitle if it
+    fails (process pool worker)
+    """
+
+    try:
+        return convert_subtitle_data(data, output_path, subtitle_format, display=False)
+    except (pysubs2.Pysubs2Error, UnicodeError, ValueError) as error:
+        logger.debug("In-memory conversion failed: %s %s", output_path, error)
+        with open(output_path, 'wb') as file:
+            file.write(data)
+        return output_path
+
+
+def convert_downloads(results, subtitle_format):
+    """
+    Convert the .vtt bodies kept by async_download_file on a process pool
+    sized to the CPU count (inline for a few files) once the event loop is
+    done, and set each 'output'
+    """
+
+    pending = [result for result in results if 'data' in result]
+    workers = get_pool_workers(len(pending))
+    datas = [result.pop('data') for result in pending]
+    paths = [result['path'] for result in pending]
+    if workers > 1:
+        with process_pool(workers) as executor:
+            outputs = list(executor.map(save_converted, datas, paths,
+                                        repeat(subtitle_format)))
+    else:
+        outputs = list(map(save_converted, datas, paths,
+                           repeat(subtitle_format)))
+
+    for result, output in zip(pending, outputs):
+        result['output'] = output
+        if output != result['path']:
+            logger.info(os.path.basename(output))
+
+
+async def async_download_files(files, headers=None, concurrency=0, limit_per_host=0, subtitle_format=''):
+    """Download files concurrently with one pooled keep-alive session"""
+
+    if not headers:
+        headers = {'User-Agent': user_agent}
+    if not concurrency:
+        concurrency = config.download.get('concurrency', 16)
+    if not limit_per_host:
+        limit_per_host = config.download.get('limit-per-host', 8)
+
+    outputs = get_output_paths(files)
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(
+        limit=concurrency, limit_per_host=limit_per_host, keepalive_timeout=30)
+    timeout = aiohttp.ClientTimeout(sock_connect=10, sock_read=10)
+
+    progress_bar = None
+    if len(outputs) > 1:
+        progress_bar = tqdm(
+            desc=os.path.basename(os.path.commonpath(
+                [output_path for _url, output_path, _segment in outputs])),
+            total=len(outputs),
+            unit='file',
+            mininterval=PROGRESS_INTERVAL
+        )
+
+    try:
+        async with aiohttp.ClientSession(headers=headers, connector=connector, timeout=timeout) as session:
+            return await asyncio.gather(*(
+                async_download_file(session, semaphore, url, output_path, progress_bar,
+                                    '' if segment else subtitle_format)
+                for url, output_path, segment in outputs))
+    finally:
+        if progress_bar:
+            progress_bar.close()
+
+
+def download_files(files, headers=None, concurrency=0, limit_per_host=0, manifest=None, subtitle_format=''):
+    """
+    Asynchronous download files without a HEAD pre-flight and return one
+    result per file: {'url', 'path', 'status', 'ok', 'size', 'hash'}
+
+    concurrency and limit_per_host default to [download] in user_config.toml.
+
+    With a manifest, files already synced are skipped and new ones recorded.
+    With subtitle_format, .vtt files (not segments) are converted in memory
+    and the result gets the converted 'output' path.
+    """
+
+    if manifest:
+        files = manifest.pending(files)
+
+    results = asyncio.run(async_download_files(
+        files=files, headers=headers, concurrency=concurrency, limit_per_host=limit_per_host,
+        subtitle_format=subtitle_format))
+    convert_downloads(results, subtitle_format)
+
+    if manifest:
+        manifest.record(files, results)
+        manifest.save()
+
+    return results
 
 
 def download_audio(m3u8_url, output):
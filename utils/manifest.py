@@ -0,0 +1,108 @@
+#!/usr/bin/python3
+# coding: utf-8
+
+"""
+This module is for incremental download manifest.
+"""
+from __future__ import annotations
+import logging
+import os
+import re
+from pathlib import Path
+import orjson
+
+EPISODE_NUMBER = re.compile(r'(?:^|\.)(S\d+E\d+)\.')
+
+
+class Manifest(object):
+    """
+    Per-title record of downloaded subtitles, stored beside the title folder
+    as .{title}.manifest.json, so a re-run only fetches missing episodes/languages
+
+    entry: {'episode', 'language', 'url', 'hash', 'output'}, episode is the
+    service's id when the file has one, else SxxExx from the filename
+    """
+
+    def __init__(self, folder_path, subtitle_format='.srt'):
+        self.folder_path = os.path.normpath(folder_path)
+        self.root = Path(self.folder_path).parent
+        self.path = self.root / \
+            f'.{os.path.basename(self.folder_path)}.manifest.json'
+        self.subtitle_format = subtitle_format
+        self.entries = self.load()
+
+    def load(self) -> dict:
+        """Load manifest"""
+
+        if self.path.is_file():
+            try:
+                return orjson.loads(self.path.read_bytes())
+            except orjson.JSONDecodeError:
+                logger.warning("Ignore broken manifest: %s", self.path)
+        return {}
+
+    def save(self) -> None:
+        """Save manifest"""
+
+        os.makedirs(self.root, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        tmp_path.write_bytes(orjson.dumps(
+            self.entries, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS))
+        os.replace(tmp_path, self.path)
+
+    def get_key(self, file) -> str:
+        """Relative path of downloaded file"""
+
+        return Path(os.path.relpath(os.path.join(file['path'], file['name']), self.root)).as_posix()
+
+    def get_episode(self, file) -> str:
+        """Episode id, or SxxExx of the filename ('' for movies)"""
+
+        if file.get('id'):
+            return str(file['id'])
+        match = EPISODE_NUMBER.search(file['name'])
+        return match.group(1) if match else ''
+
+    def get_output(self, file) -> str:
+        """Relative path of converted subtitle"""
+
+        return Path(self.get_key(file)).with_suffix(self.subtitle_format).as_posix()
+
+    def is_synced(self, file) -> bool:
+        """Subtitle has been downloaded and its converted output still exists"""
+
+        entry = self.entries.get(self.get_key(file))
+        return bool(entry) and (self.root / entry['output']).is_file()
+
+    def pending(self, files) -> list:
+        """Filter files not downloaded yet (segments are always downloaded)"""
+
+        pending_files = [file for file in files
+                         if file.get('segment') or not self.is_synced(file)]
+        logger.debug("Manifest: %s/%s file(s) to download",
+                     len(pending_files), len(files))
+        return pending_files
+
+    def record(self, files, results) -> None:
+        """Record successful downloads"""
+
+        results = {os.path.normpath(result['path']): result
+                   for result in results if result['ok']}
+        for file in files:
+            if file.get('segment'):
+                continue
+            result = results.get(os.path.normpath(
+                os.path.join(file['path'], file['name'])))
+            if result:
+                suffixes = Path(file['name']).suffixes
+                self.entries[self.get_key(file)] = {
+                    'episode': self.get_episode(file),
+                    'language': suffixes[-2].lstrip('.') if len(suffixes) > 1 else '',
+                    'url': result['url'],
+                    'hash': result['hash'],
+                    'output': self.get_output(file)
+                }
+
+
+if __name__:
+    logger = logging.getLogger(__name__)
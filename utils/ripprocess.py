@@ -13,13 +13,54 @@ from pathlib import Path
 from urllib.parse import urlparse
 import requests
 import orjson
+import pysubs2
 from configs.config import user_agent
 from constants import LANGUAGE_LIST
-from utils.subtitle import merge_subtitle_fragments
+from utils.subtitle import merge_subtitle_fragments, save_subtitle
 from utils.helper import get_language_code
 from tools.XstreamDL_CLI.extractor import Extractor
 from tools.XstreamDL_CLI.downloader import Downloader
-from tools.pyshaka.main import parse
+from tools.pyshaka.main import iter_cues
+
+
+HTML_TAGS = (
+    (re.compile(r"< *i *>"), r"{\\i1}"),
+    (re.compile(r"< */ *i *>"), r"{\\i0}"),
+    (re.compile(r"< *s *>"), r"{\\s1}"),
+    (re.compile(r"< */ *s *>"), r"{\\s0}"),
+    (re.compile(r"< *u *>"), r"{\\u1}"),
+    (re.compile(r"< */ *u *>"), r"{\\u0}"),
+    (re.compile(r"< *b *>"), r"{\\b1}"),
+    (re.compile(r"< */ *b *>"), r"{\\b0}"),
+    (re.compile(r"< */? *[a-zA-Z][^>]*>"), ""),
+)
+
+
+def html_to_ssa(text: str) -> str:
+    """Convert WebVTT payload to SubStation text like pysubs2's vtt reader"""
+
+    text = text.strip()
+    if '<' in text:
+        for pattern, repl in HTML_TAGS:
+            text = pattern.sub(repl, text)
+    return text.replace('\n', '\\N')
+
+
+def seconds_to_ms(seconds: float) -> int:
+    """Seconds to ms, truncated like pyshaka's vtt timestamps"""
+
+    return round(seconds * 1000000) // 1000
+
+
+def from_shaka_cues(cues) -> pysubs2.SSAFile:
+    """tools.pyshaka cues straight to SSAFile, no text round trip"""
+
+    subs = pysubs2.SSAFile()
+    subs.events = [pysubs2.SSAEvent(start=seconds_to_ms(cue.startTime),
+                                    end=seconds_to_ms(cue.endTime),
+                                    text=html_to_ssa(cue.payload))
+                   for cue in cues]
+    return subs
 
 
 class XstreamArgs(object):
@@ -87,6 +128,8 @@ class PyshakaArgs(object):
         self.segments_path = segments_path
         self.debug = True if log_level == logging.DEBUG else False
         self.segment_time = 0
+        # up to one process per CPU, pyshaka parses short tracks inline
+        self.workers = 0
 
 
 class RipProcess(object):
@@ -97,10 +140,13 @@ class RipProcess(object):
     def __init__(self):
         self.logger = logging.getLogger(__name__)
 
-    def download_subtitles_from_mpd(self, url, title, folder_path, url_patch=False, headers="", proxy="", log_level=logging.INFO, timescale=""):
+    def download_subtitles_from_mpd(self, url, title, folder_path, url_patch=False, headers="", proxy="", log_level=logging.INFO, timescale="", subtitle_format=""):
         """Download  subtitles from mpd url"""
         os.makedirs(folder_path, exist_ok=True)
 
+        if not subtitle_format:
+            subtitle_format = '.srt'
+
         if not headers:
             headers = {
                 'user-agent': user_agent
@@ -145,10 +191,8 @@ class RipProcess(object):
             filename = f"{title}.{subtitle_language}.vtt"
             if os.path.exists(os.path.join(segments_path, 'init.mp4')):
                 if os.path.isdir(segments_path):
-                    self.extract_sub(segments_path, self.logger.level)
-
-                    os.rename(f"{segments_path}.vtt",
-                              os.path.join(folder_path, filename))
+                    self.extract_sub(segments_path, os.path.join(
+                        folder_path, filename), subtitle_format, self.logger.level)
             else:
                 with open(os.path.join(segments_path, 'raw.json'), 'rb') as file:
                     content = file.read().decode('utf-8')
@@ -164,7 +208,7 @@ class RipProcess(object):
                             'offset': offset
                         })
                 merge_subtitle_fragments(
-                    folder_path=segments_path, filename=filename, shift_time=shift_time)
+                    folder_path=segments_path, filename=filename, subtitle_format=subtitle_format, shift_time=shift_time)
 
         for path in glob.glob(os.path.join(folder_path, "dash*")):
             if os.path.isdir(path):
@@ -172,11 +216,12 @@ class RipProcess(object):
             else:
                 os.remove(path)
 
-    def extract_sub(self, segments_path, log_level):
-        """Call pyshaka"""
+    def extract_sub(self, segments_path, file_path, subtitle_format, log_level):
+        """Call pyshaka and save its cues as the final subtitle, no intermediate .vtt"""
 
         args = PyshakaArgs(segments_path, log_level)
-        parse(args)
+        save_subtitle(from_shaka_cues(iter_cues(args)), str(Path(file_path).with_suffix(
+            subtitle_format)), subtitle_format)
 
     def get_time_scale(self, mpd_url, headers):
         """Get time scale"""
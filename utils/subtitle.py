@@ -4,48 +4,95 @@
 """
 This module is to handle subtitle.
 """
-import glob
+import codecs
+import heapq
 import re
 import logging
 import os
 import shutil
+from itertools import repeat
 from pathlib import Path
 import sys
 import pysubs2
 from chardet import detect
-from utils.helper import get_locale
+from utils.archive import SubtitleArchive
+from utils.helper import get_locale, get_pool_workers, process_pool
 from constants import SUBTITLE_FORMAT
 
 
-def get_encoding_type(source):
+BOMS = (
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+DETECT_SAMPLE_SIZE = 64 * 1024
+CP950_CODECS = ('BIG5', 'GBK', 'GB2312', 'Windows-1252', 'ISO-8859-1')
+
+# detected codec per language folder (one service, title and language), reused for its next files
+encoding_cache = {}
+
+
+def get_bom_encoding(data):
     """
-    Get file encoding type
+    Get encoding from byte order mark
     """
-    with open(source, 'rb') as source:
-        rawdata = source.read()
-    return detect(rawdata)['encoding']
+    for bom, codec in BOMS:
+        if data.startswith(bom):
+            return codec
+    return None
 
 
-def convert_utf8(srcfile):
+def detect_encoding(data, cache_key=None):
     """
-    Convert file to utf8
+    Detect non utf-8 encoding: codec cached for the same source, then chardet
+    on a bounded prefix
     """
 
-    from_codec = get_encoding_type(srcfile)
-    try:
-        if from_codec and from_codec.lower() != 'utf-8':
-            if from_codec == 'BIG5' or from_codec == 'GBK' or from_codec == 'GB2312' or from_codec == 'Windows-1252' or from_codec == 'ISO-8859-1':
-                from_codec = 'CP950'
+    codec = encoding_cache.get(cache_key)
+    if codec:
+        try:
+            data.decode(codec)
+            return codec
+        except UnicodeDecodeError:
+            pass
+
+    codec = detect(data[:DETECT_SAMPLE_SIZE])['encoding']
+    if codec in CP950_CODECS:
+        codec = 'CP950'
+    if codec and cache_key:
+        encoding_cache[cache_key] = codec
+    return codec
+
 
-            with open(srcfile, 'r', encoding=from_codec, errors='replace') as input_src:
-                data = input_src.read()
-            with open(srcfile, 'w', encoding='UTF-8') as output_src:
-                output_src.write(data)
+def decode_subtitle(data, cache_key=None):
+    """
+    Decode subtitle bytes to text
+    """
 
-    except UnicodeDecodeError:
+    codec = get_bom_encoding(data)
+    if not codec:
+        try:
+            return data.decode('utf-8')
+        except UnicodeDecodeError:
+            codec = detect_encoding(data, cache_key) or 'utf-8'
+    try:
+        return data.decode(codec, errors='replace')
+    except LookupError:
         logger.error("Decode Error")
-    except UnicodeEncodeError:
-        logger.error("Encode Error")
+        return data.decode('utf-8', errors='replace')
+
+
+def load_subtitle(srcfile):
+    """
+    Load subtitle in memory regardless of its encoding
+    """
+
+    data = Path(srcfile).read_bytes()
+    text = decode_subtitle(data, cache_key=os.path.dirname(
+        os.path.abspath(srcfile)))
+    return pysubs2.SSAFile.from_string(text)
 
 
 def is_subtitle(file_path, file_format=''):
@@ -87,132 +134,231 @@ def set_ass_style(subs):
     return subs
 
 
-def convert_subtitle(folder_path="", platform="", subtitle_format="", locale=""):
+def get_pending_subtitles(folder_paths):
+    """
+    List .vtt files to convert in every folder (or single file path)
+    """
+    pending = []
+    for folder_path in folder_paths:
+        if os.path.isdir(folder_path):
+            pending += [os.path.join(folder_path, file)
+                        for file in sorted(os.listdir(folder_path))
+                        if is_subtitle(os.path.join(folder_path, file), '.vtt')]
+        elif is_subtitle(folder_path, '.vtt'):
+            pending.append(folder_path)
+    return pending
+
+
+def convert_file(subtitle, subtitle_format='.srt'):
+    """
+    Convert one subtitle file and remove the source (process pool worker)
+    """
+    subtitle_name = str(Path(subtitle).with_suffix(subtitle_format))
+    save_subtitle(load_subtitle(subtitle), subtitle_name,
+                  subtitle_format, display=False)
+    os.remove(subtitle)
+    return subtitle_name
+
+
+def convert_files(subtitles, subtitle_format='.srt'):
+    """
+    Convert subtitle files on a process pool sized to the CPU count
+    (inline for a few files)
+    """
+    workers = get_pool_workers(len(subtitles))
+    if workers > 1:
+        with process_pool(workers) as executor:
+            yield from executor.map(convert_file, subtitles,
+                                    repeat(subtitle_format))
+    else:
+        for subtitle in subtitles:
+            yield convert_file(subtitle, subtitle_format)
+
+
+def convert_subtitle(folder_path="", platform="", subtitle_format="", locale="", languages=None):
     """
-    Convert subtitle to .srt or .ass
+    Convert subtitle to .srt or .ass (folder_path and every language folder
+    in one batch), then archive once
     """
     _ = get_locale(__name__, locale)
 
     if not subtitle_format:
         subtitle_format = '.srt'
 
-    if os.path.exists(folder_path):
-        if os.path.isdir(folder_path):
-            display = True
-            folder = os.listdir(folder_path)
-            for file in sorted(folder):
-                extenison = Path(file).suffix.lower()
-                if is_subtitle(os.path.join(folder_path, file), '.vtt'):
-                    if display:
-                        logger.info(
-                            _("\nConvert %s to %s:\n---------------------------------------------------------------"), extenison, subtitle_format)
-                        display = False
-
-                    subtitle = os.path.join(folder_path, file)
-                    subtitle_name = subtitle.replace(
-                        extenison, subtitle_format)
-                    convert_utf8(subtitle)
-                    subs = pysubs2.load(subtitle)
-                    if '.zh-Hant' in subtitle_name:
-                        subs = format_zh_subtitle(subs)
-                    subs = format_subtitle(subs)
-                    if subtitle_format == '.ass':
-                        subs = set_ass_style(subs)
-                    subs.save(subtitle_name)
-                    logger.info(os.path.basename(subtitle_name))
-                    os.remove(subtitle)
-                    folder = os.listdir(folder_path)
-            if platform:
-                archive_subtitle(folder_path=os.path.normpath(
-                    folder_path), platform=platform, locale=locale)
+    if not os.path.exists(folder_path):
+        return
 
-        elif is_subtitle(folder_path, '.vtt'):
-            subtitle_name = folder_path.replace(
-                Path(folder_path).suffix, subtitle_format)
-            convert_utf8(folder_path)
-            subs = pysubs2.load(folder_path)
-            if '.zh-Hant' in subtitle_name:
-                subs = format_zh_subtitle(subs)
-            subs = format_subtitle(subs)
-            if subtitle_format == '.ass':
-                subs = set_ass_style(subs)
-            subs.save(subtitle_name)
-            os.remove(folder_path)
-            logger.info(os.path.basename(subtitle_name))
+    archive = None
+    if platform and os.path.isdir(folder_path):
+        archive = SubtitleArchive(folder_path=folder_path, platform=platform)
 
+    folder_paths = sorted(languages) if languages else []
+    folder_paths.append(folder_path)
+    subtitles = get_pending_subtitles(folder_paths)
+    if subtitles and os.path.isdir(folder_path):
+        logger.info(
+            _("\nConvert %s to %s:\n---------------------------------------------------------------"), Path(subtitles[0]).suffix.lower(), subtitle_format)
+    for subtitle_name in convert_files(subtitles, subtitle_format):
+        logger.info(os.path.basename(subtitle_name))
+        if archive:
+            archive.add(subtitle_name)
 
-def archive_subtitle(folder_path, platform="", locale=""):
+    if archive:
+        archive_subtitle(folder_path=folder_path, platform=platform,
+                         locale=locale, archive=archive)
+
+
+def save_subtitle(subs, subtitle_name, subtitle_format='.srt', display=True):
+    """
+    Format subtitle and save it as the final artifact
     """
-    Archive subtitles
+
+    subs = normalize_subtitle(subs, zh='.zh-Hant' in subtitle_name)
+    if subtitle_format == '.ass':
+        subs = set_ass_style(subs)
+    subs.save(subtitle_name)
+    if display:
+        logger.info(os.path.basename(subtitle_name))
+
+
+def convert_subtitle_data(data, file_path, subtitle_format='.srt', display=True):
+    """
+    Convert downloaded subtitle bytes in memory, only the converted subtitle is written
+    """
+
+    if not subtitle_format:
+        subtitle_format = '.srt'
+
+    subtitle_name = str(Path(file_path).with_suffix(subtitle_format))
+    text = decode_subtitle(
+        data, cache_key=os.path.dirname(os.path.abspath(file_path)))
+    save_subtitle(pysubs2.SSAFile.from_string(text),
+                  subtitle_name, subtitle_format, display)
+    return subtitle_name
+
+
+def archive_subtitle(folder_path, platform="", locale="", archive=None):
+    """
+    Archive subtitles: add the files not pushed into the archive yet
     """
     _ = get_locale(__name__, locale)
 
-    contain_subtitle = False
-    for path, dirs, files in os.walk(folder_path):
-        if any('.srt' in s for s in files):
-            contain_subtitle = True
-            break
+    if not archive:
+        archive = SubtitleArchive(folder_path=folder_path, platform=platform)
+    with archive:
+        archive.sync()
 
-    if not contain_subtitle:
+    if not any(Path(name).suffix.lower() in SUBTITLE_FORMAT for name in archive.entries):
         sys.exit(0)
 
     logger.info(
         _("\nArchive subtitles:\n---------------------------------------------------------------"))
+    logger.info("%s.zip", archive.zipname)
 
-    if platform:
-        zipname = os.path.basename(f'{folder_path}.WEB-DL.{platform}')
-    else:
-        zipname = os.path.basename(f'{folder_path}.WEB-DL')
 
-    folder_path = os.path.normpath(folder_path)
-    logger.info("%s.zip", zipname)
+MAX_REPRESENTABLE_TIME = 359999999
+
 
-    shutil.make_archive(Path(folder_path).parent / zipname, 'zip', folder_path)
+def clamp_time(ms: int) -> int:
+    """
+    Clamp ms to the range SRT timestamps can represent
+    """
+    return min(max(ms, 0), MAX_REPRESENTABLE_TIME)
 
 
 def ms_to_timestamp(ms: int) -> str:
     """
     Convert ms to 'HH:MM:SS,mmm'
     """
-    max_representable_time = 359999999
+    return "%02d:%02d:%02d,%03d" % (pysubs2.time.ms_to_times(clamp_time(ms)))
+
 
-    if ms < 0:
-        ms = 0
-    if ms > max_representable_time:
-        ms = max_representable_time
-    return "%02d:%02d:%02d,%03d" % (pysubs2.time.ms_to_times(ms))
+def get_cue_text(sub) -> str:
+    """
+    Cue text with soft/hard line breaks as newlines
+    """
+    return sub.text.replace('\\n', '\n').replace('\\N', '\n').strip()
 
 
 def convert_list_to_subtitle(subs):
     """
     Convert list to subtitle
     """
-    text = ''
-    for index, sub in enumerate(subs):
+    subtitle = pysubs2.SSAFile()
+    subtitle.events = [
+        pysubs2.SSAEvent(start=clamp_time(sub.start),
+                         end=clamp_time(sub.end),
+                         text=get_cue_text(sub).replace('\n', '\\N'))
+        for sub in subs]
+    return subtitle
 
-        text = text + str(index + 1) + '\n'
-        text = text + ms_to_timestamp(sub.start) + \
-            ' --> ' + ms_to_timestamp(sub.end) + '\n'
-        text = text + \
-            sub.text.replace('\\n', '\n').replace('\\N', '\n').strip()
-        text = text + '\n\n'
 
-    return pysubs2.ssafile.SSAFile.from_string(text)
+MERGE_GAP = 20
 
 
-def merge_same_subtitle(subs):
+def merge_same_subtitle(subs, gap=MERGE_GAP, key=None):
     """
-    Merge same subtitles
+    Merge runs of adjacent cues with the same text (compared through key)
+    that are at most gap ms apart, and drop empty cues
     """
-    for i, sub in enumerate(subs):
-        if i > 0 and sub.text == subs[i-1].text and sub.start - subs[i-1].end <= 20:
-            subs[i-1].end = sub.end
-            subs.pop(i)
-        elif sub.text == '':
-            subs.pop(i)
+    events = []
+    last_key = None
+    for sub in subs:
+        if not sub.text:
+            continue
+        text_key = key(sub.text) if key else sub.text
+        if events and text_key == last_key and sub.start - events[-1].end <= gap:
+            events[-1].end = max(events[-1].end, sub.end)
+            continue
+        events.append(sub)
+        last_key = text_key
+    subs[:] = events
     return subs
 
 
+def load_fragment(file_path, offsets=None):
+    """
+    Load one fragment: shifted by its offset and sorted
+    """
+    subs = pysubs2.load(file_path)
+    if offsets:
+        offset = offsets.get(os.path.basename(file_path))
+        if offset:
+            subs.shift(s=offset)
+    if 'comment' in file_path:
+        add_comment(subs)
+    subs.sort()
+    return subs.events
+
+
+def merge_fragments(file_paths, offsets=None):
+    """
+    Yield cues of time-ordered fragments in (start, end) order with a k-way
+    heap merge, a fragment is only loaded once the merge reaches its first cue
+    """
+    fragments = (events for events in (load_fragment(file_path, offsets)
+                                       for file_path in file_paths) if events)
+    lookahead = next(fragments, None)
+    heap = []
+    index = 0
+    while heap or lookahead:
+        while lookahead and (not heap or lookahead[0].start <= heap[0][0]):
+            events = iter(lookahead)
+            event = next(events)
+            heapq.heappush(heap, (event.start, event.end, index, event, events))
+            index += 1
+            lookahead = next(fragments, None)
+
+        _start, _end, index_, event, events = heap[0]
+        yield event
+        event = next(events, None)
+        if event:
+            heapq.heapreplace(
+                heap, (event.start, event.end, index_, event, events))
+        else:
+            heapq.heappop(heap)
+
+
 def merge_subtitle_fragments(folder_path="", filename="", subtitle_format="", locale="", display=False, shift_time=None):
     """
     Merge subtitle fragments
@@ -222,39 +368,36 @@ def merge_subtitle_fragments(folder_path="", filename="", subtitle_format="", lo
     if not subtitle_format:
         subtitle_format = '.srt'
 
-    if os.path.exists(folder_path) and glob.glob(os.path.join(folder_path, '*.srt')) + glob.glob(os.path.join(folder_path, '*.vtt')):
-        if display:
-            logger.info(_(
-                "\nMerge segments：\n---------------------------------------------------------------"))
-        subtitles = []
-        for segment in sorted(os.listdir(folder_path)):
-            file_path = os.path.join(folder_path, segment)
-            if is_subtitle(file_path):
-                subs = pysubs2.load(file_path)
-                if shift_time:
-                    offset = next(
-                        (seg['offset'] for seg in shift_time if seg['name'] in file_path), '')
-                    subs.shift(s=offset)
-                subs = clean_subs(subs)
-                if 'comment' in file_path:
-                    add_comment(subs)
-                subtitles += subs
-        subs = convert_list_to_subtitle(subtitles)
-        subs = merge_same_subtitle(subs)
-        file_path = os.path.join(
-            Path(folder_path).parent.absolute(), filename)
+    if not os.path.isdir(folder_path):
+        return
+
+    segments = [os.path.join(folder_path, segment)
+                for segment in sorted(os.listdir(folder_path))]
+    segments = [segment for segment in segments if is_subtitle(segment)]
+    if not any(Path(segment).suffix.lower() in ('.srt', '.vtt') for segment in segments):
+        return
+
+    if display:
+        logger.info(_(
+            "\nMerge segments：\n---------------------------------------------------------------"))
+    offsets = {seg['name']: seg['offset'] for seg in shift_time or []}
+    subs = convert_list_to_subtitle(merge_fragments(segments, offsets))
+    # fragments are expected in time order, fall back to a full sort if not
+    if any(prev.start > sub.start for prev, sub in zip(subs.events, subs.events[1:])):
         subs.sort()
-        if '.zh-Hant' in file_path or '.cmn-Hant' in file_path:
-            subs = format_zh_subtitle(subs)
-        subs = format_subtitle(subs)
-        extenison = Path(file_path).suffix.lower()
-        file_path = file_path.replace(extenison, subtitle_format)
-        if subtitle_format == '.ass':
-            subs = set_ass_style(subs)
-        subs.save(file_path)
-        logger.info(os.path.basename(file_path))
-        if os.path.exists(folder_path):
-            shutil.rmtree(folder_path)
+    file_path = os.path.join(
+        Path(folder_path).parent.absolute(), filename)
+    # one normalize pass, then merge repeats of the normalized text
+    subs = merge_same_subtitle(normalize_subtitle(
+        subs, zh='.zh-Hant' in file_path or '.cmn-Hant' in file_path))
+    extenison = Path(file_path).suffix.lower()
+    file_path = file_path.replace(extenison, subtitle_format)
+    if subtitle_format == '.ass':
+        subs = set_ass_style(subs)
+    subs.save(file_path)
+    logger.info(os.path.basename(file_path))
+    if os.path.exists(folder_path):
+        shutil.rmtree(folder_path)
 
 
 def add_comment(subs):
@@ -266,78 +409,99 @@ def add_comment(subs):
     return subs
 
 
-def format_zh_subtitle(subs):
+ZH_PUNCTUATION = str.maketrans({
+    '(': '（',
+    ')': '）',
+    '!': '！',
+    '?': '？',
+    ':': '：',
+})
+INVISIBLE_CHARACTERS = str.maketrans({
+    '\u200b': None,
+    '\u200e': None,
+    '\u202a': None,
+    '\ufeff': None,
+    '\xa0': ' ',
+})
+CJK = re.compile(r'[\u4E00-\u9FFF]')
+CJK_COMMA = re.compile(r',(?=[\u4E00-\u9FFF])|(?<=[\u4E00-\u9FFF]),')
+CLOSE_PARENTHESIS_SPACES = re.compile(r'） {1,3}')
+CONVERSATION = re.compile(r'( )-[ \u4E00-\u9FFF「0-9]+')
+FIRST_SPEAKER = re.compile(r'(^[「\u4E00-\u9FFF]+.*?)\n-')
+
+
+def format_zh_text(text):
     """
-    Format subtitle
+    Format Chinese punctuation of a cue
     """
-    for sub in subs:
-        text = sub.text
-        if re.search(r'[\u4E00-\u9FFF]', text):
-            text = text.replace('(', '（')
-            text = text.replace(')', '）')
-            text = text.replace('!', '！')
-            text = text.replace('?', '？')
-            text = text.replace(':', '：')
-            text = text.replace('...', '…')
-            text = text.replace(' （', '（')
-            text = text.replace('） ', '）')
-            text = text.replace('） ', '）')
-            text = text.replace('） ', '）')
+    if CJK.search(text):
+        text = text.translate(ZH_PUNCTUATION).replace('...', '…')
+        text = CLOSE_PARENTHESIS_SPACES.sub(
+            '）', text.replace(' （', '（'))
 
-            if text.count('-') == 2:
-                text = text.replace('- ', '-')
+        if text.count('-') == 2:
+            text = text.replace('- ', '-')
 
-            text = re.sub(r',([\u4E00-\u9FFF]+)', '，\\1', text)
-            text = re.sub(r'([\u4E00-\u9FFF]+),', '\\1，', text)
+        text = CJK_COMMA.sub('，', text).replace('\u3000\u3000', ' -')
 
-            text = re.sub(r'\u3000\u3000', ' -', text)
+        if CONVERSATION.search(text):
+            text = text.replace(' -', '\n-')
 
-            conversation = re.search(r'( )-[ \u4E00-\u9FFF「0-9]+', text)
-            if conversation:
-                text = text.replace(' -', '\n-')
+        text = FIRST_SPEAKER.sub('-\\1\n-', text, count=1)
 
-            text = re.sub(r'(^[「\u4E00-\u9FFF]+.*?)\n-', '-\\1\n-', text)
+    return text.replace('  ', ' ').replace('\xa0 ', ' ').strip()
 
-        text = text.replace('  ', ' ')
-        text = text.replace('  ', ' ')
-
-        sub.text = text.strip()
 
-    return subs
+def clean_text(text):
+    """
+    Remove redundant html entities of a cue
+    """
+    if '&' in text:
+        text = text.replace('&rlm;', '').replace(
+            '&lrm;', '').replace('&amp;', '&')
+    return text.strip()
 
 
-def clean_subs(subs):
+def normalize_subtitle(subs, zh=False):
     """
-    Clean redundant subtitles
+    Format every cue in one pass (html entities and surrounding whitespace,
+    Chinese punctuation when zh, invisible characters) and drop empty cues
     """
+    events = []
     for sub in subs:
-        text = sub.text
-        text = re.sub(r"&rlm;", "", text)
-        text = re.sub(r"&lrm;", "", text)
-        text = re.sub(r"&amp;", "&", text)
-        sub.text = text.strip()
+        text = clean_text(sub.text)
+        if zh:
+            text = format_zh_text(text)
+        text = text.translate(INVISIBLE_CHARACTERS)
+        if text:
+            sub.text = text
+            events.append(sub)
+    subs[:] = events
     return subs
 
 
-def format_subtitle(subs):
+def format_zh_subtitle(subs):
     """
     Format subtitle
     """
-    delete_list = []
-    for i, sub in enumerate(subs):
-        sub.text = re.sub(r'\u200b', '', sub.text)
-        sub.text = re.sub(r'\u200e', '', sub.text)
-        sub.text = re.sub(r'\u202a', '', sub.text)
-        sub.text = re.sub(r'\ufeff', '', sub.text)
-        sub.text = re.sub(r'\xa0', ' ', sub.text)
+    for sub in subs:
+        sub.text = format_zh_text(sub.text)
+
+    return subs
 
-        if sub.text == "":
-            delete_list.append(i)
 
-    for i in reversed(delete_list):
-        del subs[i]
+def clean_subs(subs):
+    """
+    Clean redundant subtitles
+    """
+    return normalize_subtitle(subs)
 
-    return subs
+
+def format_subtitle(subs):
+    """
+    Format subtitle
+    """
+    return normalize_subtitle(subs)
 
 
 if __name__: